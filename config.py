@@ -11,4 +11,70 @@ class Config:
     SYNTH_RIDERS_PROCESS_NAME = "SynthRiders.exe"
     WEBSOCKET_HOST = "localhost"
     WEBSOCKET_PORT = "9000"
-    IMAGE_UPLOAD_URL = "https://uguu.se/upload"
\ No newline at end of file
+    WEBSOCKET_RECONNECT_INITIAL_DELAY = 1
+    WEBSOCKET_RECONNECT_MAX_DELAY = 30
+    # A connection that stayed open this long resets the reconnect backoff
+    WEBSOCKET_STABLE_CONNECTION = 60
+    IMAGE_UPLOAD_URL = "https://uguu.se/upload"
+    # Uploads are deleted by the host after 3h, so cached URLs expire a bit earlier
+    IMAGE_CACHE_TTL = 150 * 60
+    IMAGE_CACHE_MAX_ENTRIES = 500
+    IMAGE_UPLOAD_WORKERS = 2
+    IMAGE_UPLOAD_QUEUE_SIZE = 4
+    # Album art is shrunk to fit into this many pixels before it is uploaded, 0 uploads it as it is
+    IMAGE_MAX_SIZE = 512
+    IMAGE_JPEG_QUALITY = 85
+    # A worker process that takes longer to shrink an image is replaced and the image uploaded as it is
+    IMAGE_SHRINK_TIMEOUT = 10
+    IMAGE_UPLOAD_CONNECT_TIMEOUT = 5
+    IMAGE_UPLOAD_READ_TIMEOUT = 20
+    PROCESS_CHECK_INTERVAL = 15
+    # The custom songs, relative to the Synth Riders install location
+    CUSTOM_SONGS_FOLDER = join("SynthRidersUC", "CustomSongs")
+    LIBRARY_SCAN_WORKERS = 4
+    # Covers of the most recently played and newest custom songs are uploaded ahead of time,
+    # one per interval while the game is in the menus. Off unless a number of songs is configured
+    ART_WARM_MAX_SONGS = 0
+    ART_WARM_INTERVAL = 20
+    # Covers are uploaded again when their cached URL expires within this many seconds
+    ART_WARM_REFRESH_MARGIN = 30 * 60
+    # Finished songs are written to the play history in the install location, in batches
+    HISTORY_FILE = "history.db"
+    HISTORY_BATCH_SIZE = 100
+    HISTORY_FLUSH_INTERVAL = 5
+    # Note hits preallocated per song when capturing note telemetry, the buffers grow beyond it
+    TELEMETRY_CAPACITY = 4096
+    # The score rate timeline of the note telemetry is binned into this many seconds
+    TELEMETRY_BIN_SECONDS = 1
+    # WebSocket events waiting for processing before the oldest are dropped
+    EVENT_BUFFER_MAX_PENDING = 1024
+    # Suggested port for the opt-in metrics endpoint, see `metrics_port` in the config file
+    METRICS_PORT = 9465
+    # Only the most recent trace events are kept when tracing a long session
+    TRACE_MAX_EVENTS = 200_000
+    # Seconds between stack samples when profiling with SYNTHRIDERS_RPC_PROFILE=sampling
+    PROFILE_SAMPLE_INTERVAL = 0.01
+    # The log file is compressed into a backup once it reaches this size
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_BACKUP_COUNT = 3
+    LOG_CLIP_LENGTH = 1000
+    LOG_REPEAT_WINDOW = 10
+    # Maximum number of seconds until a game launch is noticed in keep running mode
+    GAME_LAUNCH_DETECTION_LATENCY = 5
+    GAME_LAUNCH_FULL_SCAN_INTERVAL = 300
+    # The progress and score in the presence are refreshed at this interval,
+    # song changes are published right away
+    PRESENCE_REFRESH_INTERVAL = 15
+    PRESENCE_COALESCE_DELAY = 0.5
+    # The state and small text while a song is played, see "Presence templates" in the README for the fields
+    PRESENCE_STATE_TEMPLATE = "{difficulty} | {time}/{length} | Score: {score:,} | Combo: {combo}x"
+    PRESENCE_SMALL_TEXT_TEMPLATE = "Mapped by {mapper}"
+    # Discord rejects longer texts
+    PRESENCE_TEXT_MAX_LENGTH = 128
+    # Notes and score per second are taken over this many seconds
+    ROLLING_STATS_WINDOW = 10
+    # Note hits kept for the rolling stats, more than this within the window shortens the window
+    ROLLING_STATS_CAPACITY = 512
+    # Discord allows 5 presence updates per 20 seconds
+    PRESENCE_RATE_LIMIT = 5
+    PRESENCE_RATE_PERIOD = 20
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import threading
+from argparse import ArgumentParser
+from base64 import b64encode
+from json import loads
+from statistics import median
+from tempfile import mkdtemp
+from time import monotonic, sleep
+from psutil import Process
+from rich.console import Console
+from src.utilities.cli import indent, print_divider
+from src.utilities.rpc.decoder import EventDecoder
+from src.utilities.rpc.recorder import load_session
+from src.utilities.rpc.replay import SessionReplayer, amplify_note_hits, synthetic_session
+from src.utilities.rpc.standins import FakeDiscordServer, FakeUploadServer
+
+# Runs the RPC headless against stand-ins for the game, Discord and the file hosting,
+# and reports how long game events take to reach Discord and how often Discord is written to.
+# Needs Unix sockets, so it runs on Linux and macOS only
+if __name__ == "__main__":
+    console = Console()
+
+    parser = ArgumentParser(description="Benchmark the RPC end to end without the game or Discord")
+    parser.add_argument("--session", help="A recorded session to replay, instead of a synthetic one")
+    parser.add_argument("--cover", help="A PNG image to use as the album art of the synthetic session")
+    parser.add_argument("--songs", type=int, default=3, help="Songs in the synthetic session")
+    parser.add_argument("--song-length", type=float, default=30, help="Seconds per synthetic song")
+    parser.add_argument("--notes-per-second", type=float, default=10, help="NoteHit events per second in the synthetic session")
+    parser.add_argument("--speed", type=float, default=1, help="Replay speed, 0 is as fast as possible")
+    parser.add_argument("--amplify", type=int, default=1, help="Send every NoteHit this many times")
+    parser.add_argument("--discord-latency", type=float, default=0, help="Seconds Discord takes to answer")
+    parser.add_argument("--drop-after", type=int, help="Drop the Discord pipe once after this many activities")
+    parser.add_argument("--rate-limit", type=int, help="Answer with rate limit errors above this many activities per 20 seconds")
+    parser.add_argument("--port", type=int, default=9100, help="The port of the replayed WebSocket")
+    parser.add_argument("--asyncio", action="store_true", help="Benchmark the asyncio runtime")
+    parser.add_argument("--trace", action="store_true", help="Write a Chrome trace of the event handling to the work folder")
+    parser.add_argument("--telemetry", action="store_true", help="Capture note telemetry to the work folder")
+    parser.add_argument("--metrics-port", type=int, help="Serve the metrics of the RPC on this port while it runs")
+    args = parser.parse_args()
+
+    # pypresence looks for the Discord socket in XDG_RUNTIME_DIR first
+    work_folder = mkdtemp(prefix="synthriders-rpc-benchmark-")
+    os.environ["XDG_RUNTIME_DIR"] = work_folder
+
+    discord = FakeDiscordServer(
+        work_folder, args.discord_latency, args.drop_after, args.rate_limit
+    )
+    discord.start()
+    uploads = FakeUploadServer()
+    uploads.start()
+
+    if args.session:
+        frames = load_session(args.session)
+    else:
+        if args.cover:
+            with open(args.cover, "rb") as f:
+                cover = f.read()
+        else:
+            # Not a decodable image, so it is uploaded without being shrunk
+            cover = os.urandom(150_000)
+        album_art = "data:image/png;base64," + b64encode(cover).decode("ascii")
+        frames = synthetic_session(args.songs, args.song_length, args.notes_per_second, album_art)
+    frames = amplify_note_hits(frames, args.amplify)
+
+    replayer = SessionReplayer(frames, "127.0.0.1", args.port, args.speed, record_sent=True)
+    threading.Thread(target=replayer.run, daemon=True).start()
+
+    config = {
+        "rich_presence_install_location": work_folder,
+        "keep_running_preference": False,
+        "promote_preference": False,
+        "discord_application_id": "0",
+        "discord_application_logo_large": "large",
+        "discord_application_logo_small": "small",
+        "synthriders_websocket_host": "127.0.0.1",
+        "synthriders_websocket_port": str(args.port),
+        "image_upload_url": uploads.upload_url,
+        # The benchmark itself stands in for the game process
+        "synthriders_process_name": Process().name(),
+        "metrics_port": args.metrics_port,
+        "trace_events": args.trace,
+        "capture_note_telemetry": args.telemetry,
+    }
+    if args.asyncio:
+        from src.utilities.rpc.aio import AsyncPresence
+
+        presence = AsyncPresence(config)
+    else:
+        from src.utilities.rpc import Presence
+
+        presence = Presence(config)
+    threading.Thread(target=presence.start, daemon=True).start()
+
+    print_divider(console, "Benchmark running", "white")
+    started = monotonic()
+    while len(replayer.sent) < len(frames):
+        sleep(0.1)
+    replay_duration = monotonic() - started
+    # Give the last events time to reach Discord
+    sleep(3)
+
+    latencies = {"SongStart": [], "SongEnd": []}
+    activity_index = 0
+    for sent_at, message in replayer.sent:
+        event_type = EventDecoder.sniff_event_type(message)
+        if event_type == "SongStart":
+            title = loads(message)["data"].get("song", "")
+            expected = lambda activity: (activity or {}).get("details", "").startswith(title)
+        elif event_type == "SongEnd":
+            expected = lambda activity: (activity or {}).get("state") == "Browsing menus"
+        else:
+            continue
+
+        for received_at, activity in discord.activities:
+            if received_at >= sent_at and expected(activity):
+                latencies[event_type].append(received_at - sent_at)
+                break
+
+    print_divider(console, "Results", "white")
+    console.print(indent(
+        f"Runtime: {'asyncio' if args.asyncio else 'threaded'}",
+        f"Frames replayed: {len(replayer.sent)} in {replay_duration:.1f}s ({len(replayer.sent) / replay_duration:.0f}/s)",
+        f"Discord IPC writes: {len(discord.activities)} ({len(discord.activities) / replay_duration * 60:.1f}/min)",
+        f"Rate limit errors: {discord.rate_limited}, dropped pipes: {discord.dropped}",
+        f"Album art uploads: {len(uploads.uploads)}",
+    ), highlight=False)
+    for event_type, values in latencies.items():
+        if values:
+            console.print(indent(
+                f"{event_type} -> Discord: min {min(values) * 1000:.0f}ms, "
+                f"median {median(values) * 1000:.0f}ms, max {max(values) * 1000:.0f}ms "
+                f"({len(values)} events)"
+            ), highlight=False)
+        else:
+            console.print(indent(f"{event_type} -> Discord: no events reached Discord"), highlight=False)
+
+    handling = presence.metrics.histograms.get(("event_handling_seconds", (("type", "NoteHit"),)))
+    if handling is not None and handling.count:
+        console.print(indent(
+            f"NoteHit handling: mean {handling.sum / handling.count * 1_000_000:.1f}us ({handling.count} events)"
+        ), highlight=False)
+
+    # The benchmark stands in for the game, so the session never ends on its own
+    presence.stop_tracing()
+    if presence.history is not None:
+        presence.history.close()
+        console.print(indent(f"Plays recorded: {presence.history.written}"), highlight=False)
+
+    discord.stop()
+    uploads.stop()
@@ -0,0 +1,74 @@
+import json
+import os
+from argparse import ArgumentParser
+from base64 import b64encode
+from time import perf_counter
+from rich.console import Console
+from rich.table import Table
+from src.utilities.cli import print_divider
+from src.utilities.rpc import Presence
+from src.utilities.rpc.decoder import EventDecoder, loads
+from src.utilities.rpc.recorder import load_session
+from src.utilities.rpc.replay import synthetic_session
+
+# Times decoding one message of every event type, with the event decoder the RPC uses
+# and with a full json.loads of the message as before, and reports the time per message
+console = Console()
+
+
+def time_per_call(decode, message: str, rounds: int) -> float:
+    """
+    Time decoding a message
+
+    :param decode: Decodes one message
+    :param message: The raw JSON message
+    :param rounds: The number of times the message is decoded
+    :return: The mean seconds per message
+    """
+    started = perf_counter()
+    for _ in range(rounds):
+        decode(message)
+    return (perf_counter() - started) / rounds
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark decoding the Synth Riders WebSocket events per event type")
+    parser.add_argument("--session", help="A recorded session to take the messages from, instead of a synthetic one")
+    parser.add_argument("--cover-size", type=int, default=300_000, help="Bytes of the synthetic album art")
+    parser.add_argument("--rounds", type=int, default=2000, help="Times every message is decoded")
+    args = parser.parse_args()
+
+    if args.session:
+        frames = load_session(args.session)
+    else:
+        album_art = "data:image/png;base64," + b64encode(os.urandom(args.cover_size)).decode("ascii")
+        frames = synthetic_session(1, 2, 10, album_art)
+        frames.append((0, json.dumps({"eventType": "Unhandled", "data": {"value": 1}})))
+
+    # The first message of every event type
+    messages = {}
+    for _, message in frames:
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        messages.setdefault(EventDecoder.sniff_event_type(message), message)
+
+    decoder = EventDecoder(Presence.HANDLED_EVENT_TYPES, {"albumArt"})
+    print_divider(console, f"Decoding every message {args.rounds} times", "white")
+    table = Table()
+    for column in ("Event type", "Size", "json.loads", "EventDecoder", "Speedup"):
+        table.add_column(column, no_wrap=True)
+    for event_type, message in messages.items():
+        # SongStart is rare and large, it is decoded less often to keep the run short
+        rounds = max(1, args.rounds // 100) if len(message) > 10_000 else args.rounds
+        before = time_per_call(json.loads, message, rounds)
+        after = time_per_call(decoder.decode, message, rounds)
+        table.add_row(
+            str(event_type),
+            f"{len(message):,} B",
+            f"{before * 1_000_000:.1f}us",
+            f"{after * 1_000_000:.1f}us",
+            f"{before / after:.1f}x",
+        )
+
+    console.print(table)
+    console.print(f"JSON backend: {loads.__module__}", highlight=False)
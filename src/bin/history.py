@@ -0,0 +1,97 @@
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
+from json import loads
+from os import getenv
+from os.path import abspath, dirname, exists, join
+from time import perf_counter, time
+from rich.console import Console
+from rich.table import Table
+from config import Config
+from src.utilities.cli import print_divider
+from src.utilities.rpc.history import open_history, play_counts, top_scores
+
+# Queries the play history the RPC records in its install location
+console = Console()
+
+
+def default_install_location() -> str:
+    """
+    Find the install location of the RPC, where the play history is recorded
+
+    :return: The folder of the executable when frozen, otherwise the install location the setup suggests,
+        or the one stored in its config file
+    """
+    if getattr(sys, "frozen", False):
+        return abspath(dirname(sys.executable))
+
+    install_location = join(getenv("LOCALAPPDATA") or "", "Synth Riders DiscordRPC")
+    try:
+        with open(join(install_location, "config", "config.json"), "r") as f:
+            return loads(f.read()).get("rich_presence_install_location") or install_location
+    except (OSError, ValueError, AttributeError):
+        return install_location
+
+
+parser = ArgumentParser(description="Show the top scores and most played songs of the play history")
+parser.add_argument(
+    "--database",
+    default=join(default_install_location(), Config.HISTORY_FILE),
+    help="The play history database, defaults to the one in the install location",
+)
+parser.add_argument("--limit", type=int, default=10)
+parser.add_argument("--days", type=float, help="Only include plays of the last days")
+subparsers = parser.add_subparsers(dest="command", required=True)
+top_parser = subparsers.add_parser("top", help="The plays with the highest scores")
+top_parser.add_argument("--song", help="Only plays of the song with this title")
+top_parser.add_argument("--difficulty", help="Only plays on this difficulty")
+subparsers.add_parser("counts", help="The most played songs")
+args = parser.parse_args()
+
+if not exists(args.database):
+    console.print(f"No play history found at {args.database}")
+    raise SystemExit(1)
+
+connection = open_history(args.database)
+since = time() - args.days * 24 * 60 * 60 if args.days else None
+
+
+def format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
+started = perf_counter()
+if args.command == "top":
+    rows = top_scores(connection, args.limit, args.song, args.difficulty, since)
+    print_divider(console, "Top scores", "white")
+    table = Table()
+    for column in ("Score", "Max combo", "Song", "Mapper", "Difficulty", "Played", "Completed"):
+        table.add_column(column, no_wrap=True)
+    for row in rows:
+        table.add_row(
+            f"{row['score']:,}",
+            f"{row['max_combo']}x",
+            f"{row['title']} by {row['artist']}",
+            row["mapper"],
+            row["difficulty"],
+            format_timestamp(row["started_at"]),
+            "yes" if row["completed"] else "no",
+        )
+else:
+    rows = play_counts(connection, args.limit, since)
+    print_divider(console, "Most played songs", "white")
+    table = Table()
+    for column in ("Plays", "Song", "Mapper", "Best score", "Last played"):
+        table.add_column(column, no_wrap=True)
+    for row in rows:
+        table.add_row(
+            str(row["plays"]),
+            f"{row['title']} by {row['artist']}",
+            row["mapper"],
+            f"{row['best_score']:,}",
+            format_timestamp(row["last_played"]),
+        )
+elapsed = perf_counter() - started
+
+console.print(table)
+console.print(f"{len(rows)} rows in {elapsed * 1000:.1f}ms")
@@ -0,0 +1,85 @@
+import os
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+import requests
+from rich.console import Console
+from config import Config
+from src.utilities.cli import indent, print_divider
+from src.utilities.rpc.images import ImageShrinker
+
+# Shrinks a corpus of cover images the way the RPC does before uploading them,
+# and reports how much smaller (and, with --upload-url, how much faster to upload) they get
+if __name__ == "__main__":
+    console = Console()
+
+    parser = ArgumentParser(description="Benchmark shrinking album art before the upload")
+    parser.add_argument("covers", help="A folder of cover images")
+    parser.add_argument("--max-size", type=int, default=Config.IMAGE_MAX_SIZE)
+    parser.add_argument("--quality", type=int, default=Config.IMAGE_JPEG_QUALITY)
+    parser.add_argument(
+        "--upload-url",
+        help="Also upload every original and shrunk cover to this pomf-compatible host and time it",
+    )
+    args = parser.parse_args()
+
+    shrinker = ImageShrinker(args.max_size, args.quality)
+    if not shrinker.enabled:
+        console.print("Pillow is not installed, or shrinking is disabled by --max-size 0")
+        raise SystemExit(1)
+
+    paths = sorted(
+        os.path.join(args.covers, name)
+        for name in os.listdir(args.covers)
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))
+    )
+    if not paths:
+        console.print(f"No cover images found in {args.covers}")
+        raise SystemExit(1)
+
+
+    def upload(image_data: bytes, image_type: str) -> float:
+        started = perf_counter()
+        response = requests.post(
+            args.upload_url,
+            files={"files[]": (f"cover.{image_type}", image_data, f"image/{image_type}")},
+            timeout=(Config.IMAGE_UPLOAD_CONNECT_TIMEOUT, Config.IMAGE_UPLOAD_READ_TIMEOUT),
+        )
+        response.raise_for_status()
+        return perf_counter() - started
+
+
+    # The first image also starts the worker process, which is not what is being measured
+    with open(paths[0], "rb") as f:
+        shrinker.shrink(f.read(), "png")
+
+    original_sizes, shrunk_sizes, shrink_times, original_uploads, shrunk_uploads = [], [], [], [], []
+    print_divider(console, f"Shrinking {len(paths)} covers", "white")
+    for path in paths:
+        with open(path, "rb") as f:
+            image_data = f.read()
+        image_type = os.path.splitext(path)[1][1:].lower()
+
+        started = perf_counter()
+        shrunk_data, shrunk_type = shrinker.shrink(image_data, image_type)
+        shrink_times.append(perf_counter() - started)
+        original_sizes.append(len(image_data))
+        shrunk_sizes.append(len(shrunk_data))
+
+        if args.upload_url:
+            original_uploads.append(upload(image_data, image_type))
+            shrunk_uploads.append(upload(shrunk_data, shrunk_type))
+
+    print_divider(console, "Results", "white")
+    console.print(indent(
+        f"Original: median {median(original_sizes) / 1024:.0f} KB, total {sum(original_sizes) / 1024 / 1024:.1f} MB",
+        f"Shrunk: median {median(shrunk_sizes) / 1024:.0f} KB, total {sum(shrunk_sizes) / 1024 / 1024:.1f} MB "
+        f"({sum(original_sizes) / sum(shrunk_sizes):.1f}x smaller)",
+        f"Shrinking: median {median(shrink_times) * 1000:.0f}ms, max {max(shrink_times) * 1000:.0f}ms",
+    ), highlight=False)
+    if args.upload_url:
+        console.print(indent(
+            f"Upload original: median {median(original_uploads) * 1000:.0f}ms",
+            f"Upload shrunk: median {median(shrunk_uploads) * 1000:.0f}ms "
+            f"({median(original_uploads) / median(shrunk_uploads):.1f}x faster)",
+        ), highlight=False)
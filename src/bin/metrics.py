@@ -0,0 +1,89 @@
+import re
+from argparse import ArgumentParser
+from collections import defaultdict
+import requests
+from rich.console import Console
+from rich.table import Table
+from config import Config
+from src.utilities.cli import print_divider
+from src.utilities.rpc.metrics import Metrics
+
+# Prints a snapshot of the metrics of a running RPC, which serves them when `metrics_port` is set in its config
+console = Console()
+
+parser = ArgumentParser(description="Dump a snapshot of the metrics of the running RPC")
+parser.add_argument("--port", type=int, default=Config.METRICS_PORT)
+parser.add_argument("--raw", action="store_true", help="Print the Prometheus text as served")
+args = parser.parse_args()
+
+try:
+    response = requests.get(f"http://127.0.0.1:{args.port}/metrics", timeout=5)
+    response.raise_for_status()
+except requests.RequestException as e:
+    console.print(f"Could not read the metrics, is the RPC running with metrics_port {args.port}? ({e})")
+    raise SystemExit(1)
+
+if args.raw:
+    print(response.text, end="")
+    raise SystemExit(0)
+
+LINE = re.compile(r"^(\w+?)(?:\{(.*)\})? (\S+)$")
+LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+values = []
+histograms = defaultdict(lambda: {"buckets": [], "sum": 0.0, "count": 0})
+for line in response.text.splitlines():
+    match = LINE.match(line)
+    if line.startswith("#") or match is None:
+        continue
+
+    name, labels, value = match.groups()
+    name = name.removeprefix(Metrics.PREFIX)
+    labels = dict(LABEL.findall(labels or ""))
+    le = labels.pop("le", None)
+    label_text = ", ".join(f"{key}={value}" for key, value in labels.items())
+
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix):
+            histogram = histograms[(name.removesuffix(suffix), label_text)]
+            if suffix == "_bucket":
+                histogram["buckets"].append((float(le), float(value)))
+            else:
+                histogram[suffix[1:]] = float(value)
+            break
+    else:
+        values.append((name, label_text, value))
+
+
+def quantile(buckets: list[tuple[float, float]], count: float, q: float) -> str:
+    # The upper bound of the bucket the quantile falls into
+    for bound, cumulative in buckets:
+        if cumulative >= q * count:
+            return "> 30s" if bound == float("inf") else f"<= {bound * 1000:g}ms"
+    return "-"
+
+
+print_divider(console, "Counters", "white")
+table = Table()
+for column in ("Metric", "Labels", "Value"):
+    table.add_column(column, no_wrap=True)
+for name, label_text, value in values:
+    table.add_row(name, label_text, value)
+console.print(table)
+
+print_divider(console, "Latencies", "white")
+table = Table()
+for column in ("Metric", "Labels", "Count", "Mean", "p50", "p99"):
+    table.add_column(column, no_wrap=True)
+for (name, label_text), histogram in sorted(histograms.items()):
+    count = histogram["count"]
+    mean = f"{histogram['sum'] / count * 1000:.3f}ms" if count else "-"
+    table.add_row(
+        name,
+        label_text,
+        f"{count:g}",
+        mean,
+        quantile(histogram["buckets"], count, 0.5),
+        quantile(histogram["buckets"], count, 0.99),
+    )
+console.print(table)
@@ -0,0 +1,31 @@
+from argparse import ArgumentParser
+from config import Config
+from src.utilities.rpc.recorder import load_session
+from src.utilities.rpc.replay import SessionReplayer, amplify_note_hits
+
+# Replays a session recorded with `--record` as a stand-in for the SynthRiders WebSocket,
+# so the RPC can be run and benchmarked without the game
+parser = ArgumentParser(description="Replay a recorded Synth Riders WebSocket session")
+parser.add_argument("session", help="The recorded session file (.jsonl.gz)")
+parser.add_argument("--host", default=Config.WEBSOCKET_HOST)
+parser.add_argument("--port", type=int, default=int(Config.WEBSOCKET_PORT))
+parser.add_argument(
+    "--speed",
+    type=float,
+    default=1,
+    help="Replay speed, 1 is real time and 0 is as fast as possible",
+)
+parser.add_argument(
+    "--amplify",
+    type=int,
+    default=1,
+    help="Send every NoteHit this many times to stress the event handling",
+)
+parser.add_argument(
+    "--loop", action="store_true", help="Start over once the session has been replayed"
+)
+args = parser.parse_args()
+
+frames = amplify_note_hits(load_session(args.session), args.amplify)
+print(f"Replaying {len(frames)} frames on ws://{args.host}:{args.port}")
+SessionReplayer(frames, args.host, args.port, args.speed, args.loop).run()
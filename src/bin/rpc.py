@@ -1,21 +1,38 @@
 import sys
+from multiprocessing import freeze_support
 from os.path import exists, join, abspath, dirname, normcase, normpath
 from json import loads
 from src.utilities.rpc import Presence
 
-config_path = join(abspath(dirname(sys.executable)), "config/config.json")
+if __name__ == "__main__":
+    # Album art is shrunk in a worker process, which the frozen executable has to be able to start
+    freeze_support()
 
-if not exists(config_path):
-    raise Exception(f"Config file does not exist, {config_path}")
+    config_path = join(abspath(dirname(sys.executable)), "config/config.json")
 
-with open(config_path, "r") as f:
-    config = loads(f.read())
-    if normpath(normcase(config["rich_presence_install_location"])) != normpath(
-        normcase(abspath(dirname(sys.executable)))
-    ):
-        raise Exception(
-            "The rich presence install location in the config file does not match the actual install location. Please update the config file, or setup the RPC again"
-        )
+    if not exists(config_path):
+        raise Exception(f"Config file does not exist, {config_path}")
 
-presence = Presence(config)
-presence.start()
+    with open(config_path, "r") as f:
+        config = loads(f.read())
+        if normpath(normcase(config["rich_presence_install_location"])) != normpath(
+            normcase(abspath(dirname(sys.executable)))
+        ):
+            raise Exception(
+                "The rich presence install location in the config file does not match the actual install location. Please update the config file, or setup the RPC again"
+            )
+
+    if "--record" in sys.argv[1:]:
+        config["record_sessions"] = True
+
+    if "--trace" in sys.argv[1:]:
+        config["trace_events"] = True
+
+    if "--asyncio" in sys.argv[1:]:
+        # The asyncio runtime needs aiohttp and websockets, so it is only imported when requested
+        from src.utilities.rpc.aio import AsyncPresence
+
+        presence = AsyncPresence(config)
+    else:
+        presence = Presence(config)
+    presence.start()
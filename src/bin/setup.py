@@ -118,6 +118,19 @@ def get_config(console: Console) -> dict:
         "synthriders_websocket_host": Config.WEBSOCKET_HOST,
         "synthriders_websocket_port": Config.WEBSOCKET_PORT,
         "image_upload_url": Config.IMAGE_UPLOAD_URL,
+        "image_max_size": Config.IMAGE_MAX_SIZE,
+        "prewarm_album_art_songs": Config.ART_WARM_MAX_SONGS,
+        "game_launch_detection_latency": Config.GAME_LAUNCH_DETECTION_LATENCY,
+        "record_sessions": False,
+        "record_play_history": True,
+        "capture_note_telemetry": False,
+        "presence_state_template": Config.PRESENCE_STATE_TEMPLATE,
+        "presence_small_text_template": Config.PRESENCE_SMALL_TEXT_TEMPLATE,
+        "rolling_stats_window": Config.ROLLING_STATS_WINDOW,
+        "trace_events": False,
+        "profile_mode": None,
+        "tracemalloc_interval": None,
+        "metrics_port": None,
     }
 
 
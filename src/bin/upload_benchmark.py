@@ -0,0 +1,102 @@
+import base64
+import os
+import re
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+import requests
+from rich.console import Console
+from src.utilities.cli import indent, print_divider
+from src.utilities.rpc import Presence
+from src.utilities.rpc.standins import FakeUploadServer
+
+# Uploads album art to a stand-in for the file hosting the way the RPC used to, through a regex,
+# a temporary file and a new connection per upload, and the way it does now, from memory over
+# a pooled connection, and reports the time and the bytes allocated per upload
+console = Console()
+
+
+def upload_before(upload_url: str, base64_string: str) -> str:
+    match = re.match(r"data:image/\w+;base64,(.*)", base64_string)
+    image_data = base64.b64decode(match.group(1))
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
+        temp_file.write(image_data)
+        temp_file_path = temp_file.name
+    with open(temp_file_path, "rb") as image_file:
+        response = requests.post(upload_url, files={"files[]": image_file})
+    os.remove(temp_file_path)
+    return response.json()["files"][0]["url"]
+
+
+def upload_after(presence: Presence, upload_url: str, base64_string: str) -> str:
+    # The upload cache is skipped, so every round uploads
+    return presence.upload_image_data(upload_url, *presence.decode_base64_image(base64_string))
+
+
+def measure(upload, rounds: int) -> tuple[list[float], int]:
+    """
+    Time every upload, then trace the allocations of one more
+
+    :param upload: Uploads the album art once
+    :param rounds: The number of timed uploads
+    :return: The seconds per upload and the peak bytes allocated by one upload
+    """
+    times = []
+    for _ in range(rounds):
+        started = perf_counter()
+        upload()
+        times.append(perf_counter() - started)
+
+    # Traced separately, tracing slows down every allocation
+    tracemalloc.start()
+    upload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark the album art upload against a stand-in file hosting")
+    parser.add_argument("--cover", help="An image to upload, instead of random bytes")
+    parser.add_argument("--size", type=int, default=300_000, help="Bytes of the random album art")
+    parser.add_argument("--rounds", type=int, default=50, help="Uploads per upload path")
+    args = parser.parse_args()
+
+    if args.cover:
+        with open(args.cover, "rb") as f:
+            cover = f.read()
+    else:
+        cover = os.urandom(args.size)
+    album_art = "data:image/png;base64," + base64.b64encode(cover).decode("ascii")
+
+    uploads = FakeUploadServer()
+    uploads.start()
+    presence = Presence({
+        "rich_presence_install_location": tempfile.mkdtemp(prefix="synthriders-rpc-upload-benchmark-"),
+        "discord_application_id": "0",
+        "record_play_history": False,
+    })
+
+    print_divider(console, f"Uploading {len(album_art) // 1024} KB of album art {args.rounds} times", "white")
+    results = {
+        "Before": measure(lambda: upload_before(uploads.upload_url, album_art), args.rounds),
+        "After": measure(lambda: upload_after(presence, uploads.upload_url, album_art), args.rounds),
+    }
+
+    print_divider(console, "Results", "white")
+    for name, (times, peak) in results.items():
+        console.print(indent(
+            f"{name}: median {median(times) * 1000:.2f}ms, max {max(times) * 1000:.2f}ms per upload, "
+            f"peak {peak / 1024:.0f} KB allocated"
+        ), highlight=False)
+    before_times, before_peak = results["Before"]
+    after_times, after_peak = results["After"]
+    console.print(indent(
+        f"{median(before_times) / median(after_times):.1f}x faster, "
+        f"{before_peak / after_peak:.1f}x less allocated"
+    ), highlight=False)
+
+    presence.logger.close()
+    uploads.stop()
@@ -1,3 +1,22 @@
 from .assets import DiscordAssets
+from .cache import UploadCache
+from .decoder import EventDecoder, LazyField
+from .history import Play, PlayHistory, open_history, play_counts, top_scores
+from .images import ImageShrinker, shrink_image
+from .ingest import EventBuffer, NoteHits
+from .library import SongLibrary, read_cover, read_song_metadata
+from .lifecycle import Lifecycle
 from .logger import Logger
+from .metrics import Counter, Histogram, Metrics, MetricsServer
+from .process import LaunchDetector, ProcessWatcher
+from .profiling import Profiler, SamplingProfiler
+from .publisher import PresencePublisher, TokenBucket
+from .recorder import SessionRecorder, load_session
+from .state import GameState, PlayState, SongState
+from .stats import RollingStats
+from .supervisor import ReconnectBackoff, WebSocketSupervisor
+from .telemetry import NoteTelemetry, summarize_notes
+from .tracing import Tracer
+from .uploader import ImageUploader
+from .warmer import ArtWarmer
 from .presence import Presence
@@ -0,0 +1,391 @@
+import asyncio
+import time
+from typing import Callable
+
+import aiohttp
+import websockets
+from pypresence import AioPresence
+from pypresence.exceptions import PyPresenceException
+
+from config import Config
+from src.utilities.rpc.lifecycle import Lifecycle
+from src.utilities.rpc.logger import Logger
+from src.utilities.rpc.presence import Presence
+from src.utilities.rpc.publisher import AsyncPresencePublisher
+from src.utilities.rpc.supervisor import ReconnectBackoff
+
+
+class AsyncImageUploader:
+    """
+    Uploads album art as tasks on the event loop, with the same limits as the threaded uploader
+    """
+
+    def __init__(
+        self,
+        upload: Callable,
+        logger: Logger,
+        workers: int = 2,
+        queue_size: int = 4,
+    ) -> None:
+        """
+        Create a new uploader
+
+        :param upload: Coroutine function uploading a base64 data URL and returning the hosted URL
+        :param logger: The logger to report failed uploads to
+        :param workers: The number of concurrent uploads
+        :param queue_size: The maximum number of uploads waiting for a free slot
+        """
+        self.upload = upload
+        self.logger = logger
+        self.max_pending = workers + queue_size
+        self.slots = asyncio.Semaphore(workers)
+        self.pending = set()
+
+    def submit(self, base64_string: str, on_done: Callable[[str], None]) -> bool:
+        """
+        Schedule an image for upload, must be called from the event loop
+
+        :param base64_string: The image as a base64 data URL
+        :param on_done: Called with the hosted URL once the upload succeeded
+        :return: False if too many uploads are pending and the image was not scheduled
+        """
+        if len(self.pending) >= self.max_pending:
+            self.logger.warning("Upload queue is full, skipping album art")
+            return False
+
+        task = asyncio.create_task(self.run(base64_string, on_done))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return True
+
+    async def run(self, base64_string: str, on_done: Callable[[str], None]) -> None:
+        async with self.slots:
+            try:
+                url = await self.upload(base64_string)
+                if url:
+                    on_done(url)
+            except Exception as e:
+                self.logger.error(f"Album art upload failed: {e}")
+
+
+class AsyncPresence(Presence):
+    """
+    Runs the RPC on a single asyncio event loop
+
+    Discord, the SynthRiders WebSocket, the album art uploads and the process polling
+    all share one thread, so there are no thread handoffs and the state writer lock is never contended.
+    Event handling and presence rendering are shared with the threaded runtime
+    """
+
+    def __init__(self, config: dict) -> None:
+        # Counted by websocket_loop(), the threaded supervisor is not used on the event loop
+        self.reconnect_count = 0
+        super().__init__(config)
+
+    def create_session(self) -> None:
+        # Uploads go through the aiohttp session opened in run()
+        return None
+
+    def create_discord_client(self) -> None:
+        # AioPresence needs the running loop and is created in run()
+        return None
+
+    def create_websocket(self) -> None:
+        # websocket_loop() connects on the event loop
+        return None
+
+    def websocket_reconnect_count(self) -> int:
+        return self.reconnect_count
+
+    def start(self) -> None:
+        """
+        Start the RPC
+        """
+        asyncio.run(self.run())
+
+    async def run(self) -> None:
+        """
+        Run the RPC until Synth Riders exits, or forever in keep running mode
+        """
+        self.loop = loop = asyncio.get_running_loop()
+        self.presence = AioPresence(self.config.get("discord_application_id"), loop=loop)
+        self.publisher = AsyncPresencePublisher(
+            self.render_presence,
+            self.update_presence,
+            Config.PRESENCE_REFRESH_INTERVAL,
+            Config.PRESENCE_COALESCE_DELAY,
+            Config.PRESENCE_RATE_LIMIT,
+            Config.PRESENCE_RATE_PERIOD,
+        )
+        self.uploader = AsyncImageUploader(
+            self.upload_base64_image_async,
+            self.logger,
+            Config.IMAGE_UPLOAD_WORKERS,
+            Config.IMAGE_UPLOAD_QUEUE_SIZE,
+        )
+        self.uploads_in_flight: dict[str, asyncio.Task] = {}
+
+        handlers = {
+            Lifecycle.WAITING_FOR_DISCORD: self.wait_for_discord,
+            Lifecycle.WAITING_FOR_GAME: self.wait_for_game,
+            Lifecycle.IN_GAME: self.run_game_session,
+            Lifecycle.GAME_EXITED: self.handle_game_exit,
+        }
+        self.websocket_task = None
+        self.events_available = asyncio.Event()
+        event_task = asyncio.create_task(self.process_events_async())
+
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=Config.IMAGE_UPLOAD_CONNECT_TIMEOUT,
+                sock_read=Config.IMAGE_UPLOAD_READ_TIMEOUT,
+            )
+        ) as self.http:
+            self.logger.clear()
+            self.start_profiling()
+            self.start_metrics_server()
+            self.start_library_scan()
+            self.lifecycle = Lifecycle.WAITING_FOR_DISCORD
+            while self.lifecycle is not None:
+                try:
+                    self.lifecycle = await handlers[self.lifecycle]()
+                except (PyPresenceException, OSError) as e:
+                    self.logger.error(f"Lost connection to Discord: {e}")
+                    self.metrics.inc("discord_reconnects_total")
+                    self.lifecycle = Lifecycle.WAITING_FOR_DISCORD
+                except Exception as e:
+                    self.logger.error(f"An error occurred: {e}")
+                    break
+        event_task.cancel()
+
+    async def wait_for_discord(self) -> Lifecycle:
+        await self.connect_discord()
+        self.publisher.reset()
+        return Lifecycle.WAITING_FOR_GAME
+
+    async def wait_for_game(self) -> Lifecycle | None:
+        """
+        Poll for newly started processes until Synth Riders is running
+        """
+        if not self.synth_riders_process_exists():
+            if not self.config.get("keep_running_preference"):
+                self.logger.info("Synth Riders is not running")
+                return None
+
+            self.logger.info("Waiting for Synth Riders...")
+            while (pid := self.game_launch.poll()) is None:
+                await asyncio.sleep(self.game_launch.poll_interval)
+            self.game_process.track(pid)
+
+        return Lifecycle.IN_GAME
+
+    async def run_game_session(self) -> Lifecycle:
+        if not self.start_time:
+            self.start_time = int(time.time())
+        self.start_recording()
+        self.start_tracing()
+        if self.websocket_task is None or self.websocket_task.done():
+            self.websocket_task = asyncio.create_task(self.websocket_loop())
+        await self.rpc_loop()
+        return Lifecycle.GAME_EXITED
+
+    async def handle_game_exit(self) -> Lifecycle | None:
+        self.logger.info("Synth Riders closed")
+        self.websocket_task.cancel()
+        self.events.clear()
+        self.stop_recording()
+        self.stop_tracing()
+        self.reset_game_state()
+        self.start_time = 0
+        await self.presence.clear()
+        self.publisher.reset()
+
+        if self.config.get("keep_running_preference"):
+            return Lifecycle.WAITING_FOR_GAME
+        return None
+
+    async def connect_discord(self) -> None:
+        while True:
+            try:
+                await self.presence.connect()
+                break
+            except Exception as e:
+                self.logger.info("Waiting for Discord...")
+                await asyncio.sleep(15)
+
+    async def websocket_loop(self) -> None:
+        """
+        Receive messages from the SynthRiders WebSocket, reconnecting with backoff when the connection closes
+        """
+        backoff = ReconnectBackoff(
+            Config.WEBSOCKET_RECONNECT_INITIAL_DELAY,
+            Config.WEBSOCKET_RECONNECT_MAX_DELAY,
+        )
+        while True:
+            opened_at = None
+            try:
+                # The SongStart message carries the album art and can be larger than the default limit
+                async with websockets.connect(self.ws_url, max_size=None) as ws:
+                    opened_at = time.monotonic()
+                    self.on_websocket_open()
+                    async for message in ws:
+                        self.handle_websocket_message(message)
+                        self.events_available.set()
+            except (OSError, websockets.WebSocketException):
+                pass
+
+            if opened_at is not None:
+                self.on_websocket_close()
+                if time.monotonic() - opened_at >= Config.WEBSOCKET_STABLE_CONNECTION:
+                    backoff.reset()
+
+            await asyncio.sleep(backoff.next_delay())
+            self.reconnect_count += 1
+
+    async def process_events_async(self) -> None:
+        """
+        Process buffered events whenever the WebSocket task lets the event loop run,
+        so a burst of messages read at once is coalesced
+        """
+        while True:
+            await self.events_available.wait()
+            self.events_available.clear()
+            self.process_buffered_events()
+
+    async def rpc_loop(self) -> None:
+        """
+        Publish the presence until Synth Riders exits
+        """
+        while self.synth_riders_process_exists():
+            await self.publisher.run_until(
+                time.monotonic() + Config.PROCESS_CHECK_INTERVAL
+            )
+
+    async def update_presence(self, payload: dict) -> None:
+        """
+        Send a rendered presence to Discord
+
+        :param payload: The keyword arguments for the presence update
+        """
+        with self.metrics.time("presence_update_seconds"), self.trace(
+            "update_presence", *self.take_traced_pending_ids(), flow="f"
+        ):
+            await self.presence.update(**payload)
+
+    def prewarm_image_data(self, image_data: bytes, image_type: str) -> str:
+        """
+        Shrink a cover on the warmer thread and upload it through the event loop
+
+        :param image_data: The decoded image bytes
+        :param image_type: The image type
+        :return: The URL of the uploaded image
+        """
+        shrunk_data, shrunk_type = self.shrink_image(image_data, image_type)
+        return asyncio.run_coroutine_threadsafe(
+            self.upload_image_data_async(
+                self.config.get("image_upload_url"), shrunk_data, shrunk_type
+            ),
+            self.loop,
+        ).result()
+
+    async def upload_base64_image_async(self, base64_string: str) -> str:
+        """
+        Upload a base64 data URL, sharing the upload cache with the threaded runtime
+
+        :param base64_string: The image as a base64 data URL
+        :return: The URL of the uploaded image
+        """
+        image_data, image_type = self.decode_base64_image(base64_string)
+
+        key = self.upload_cache.key(image_data)
+        url = self.upload_cache.get(key)
+        if url is not None:
+            self.logger.info(f"Using cached album art: {url}")
+            return url
+
+        # Concurrent requests for the same image share one upload
+        task = self.uploads_in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(
+                self.shrink_and_upload_async(
+                    self.config.get("image_upload_url"), image_data, image_type
+                )
+            )
+            self.uploads_in_flight[key] = task
+            task.add_done_callback(lambda _: self.uploads_in_flight.pop(key, None))
+
+        url = await asyncio.shield(task)
+        self.upload_cache.put(key, url)
+        return url
+
+    async def shrink_and_upload_async(
+        self, upload_url: str, image_data: bytes, image_type: str
+    ) -> str:
+        """
+        Shrink album art in the worker process without blocking the event loop, then upload it
+
+        :param upload_url: The pomf-compatible upload URL
+        :param image_data: The decoded image bytes
+        :param image_type: The image type
+        :return: The URL of the uploaded image
+        """
+        try:
+            future = self.shrinker.submit(image_data, image_type)
+            executor = self.shrinker.executor
+            with self.metrics.time("image_shrink_seconds"):
+                try:
+                    shrunk_data, shrunk_type = await asyncio.wait_for(
+                        asyncio.wrap_future(future), self.shrinker.timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.shrinker.restart(executor)
+                    raise TimeoutError(
+                        f"The worker process took longer than {self.shrinker.timeout}s"
+                    ) from None
+            self.log_shrunk_image(image_data, shrunk_data)
+        except Exception as e:
+            self.logger.warning(f"Could not shrink album art, uploading it as it is: {e}")
+            shrunk_data, shrunk_type = image_data, image_type
+
+        return await self.upload_image_data_async(upload_url, shrunk_data, shrunk_type)
+
+    async def upload_image_data_async(
+        self, upload_url: str, image_data: bytes, image_type: str = "png"
+    ) -> str:
+        """
+        Upload an image to the file hosting from memory
+
+        :param upload_url: The pomf-compatible upload URL
+        :param image_data: The decoded image bytes
+        :param image_type: The image type, used for the file name and content type
+        :return: The URL of the uploaded image
+        """
+        with self.metrics.time("upload_seconds"):
+            try:
+                return await self.post_image_data_async(upload_url, image_data, image_type)
+            except Exception:
+                self.metrics.inc("upload_failures_total")
+                raise
+
+    async def post_image_data_async(self, upload_url: str, image_data: bytes, image_type: str) -> str:
+        form = aiohttp.FormData()
+        form.add_field(
+            "files[]",
+            image_data,
+            filename=f"cover.{image_type}",
+            content_type=f"image/{image_type}",
+        )
+
+        async with self.http.post(upload_url, data=form) as response:
+            text = await response.text()
+            self.logger.info(f"Upload response: {text}")
+
+            if response.status == 200:
+                try:
+                    return (await response.json(content_type=None))["files"][0]["url"]
+                except (KeyError, IndexError, ValueError):
+                    self.logger.error(f"Unexpected response format: {text}")
+                    raise ValueError("Unexpected response format")
+            else:
+                self.logger.error(f"Unexpected response format: {text}")
+                raise ValueError(f"Upload failed with status code {response.status}: {text}")
@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from hashlib import blake2b
+from json import dumps, loads
+from os import makedirs, replace
+from os.path import exists, join
+from time import time
+from typing import Callable
+
+
+class UploadCache:
+    """
+    Persistent cache of uploaded images, keyed by a hash of the image bytes
+
+    Entries expire before the upload host deletes the file,
+    and the least recently used entries are evicted once the cache is full
+    """
+
+    cache_file_path: str
+    ttl: float
+    max_entries: int
+
+    def __init__(self, cache_folder: str, ttl: float, max_entries: int) -> None:
+        """
+        Create a new upload cache and load the entries stored on disk
+
+        :param cache_folder: The folder to store the cache file in
+        :param ttl: The number of seconds an uploaded image stays valid
+        :param max_entries: The maximum number of entries to keep
+        """
+        makedirs(cache_folder, exist_ok=True)
+        self.cache_file_path = join(cache_folder, "uploads.json")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (url, upload timestamp), ordered from least to most recently used
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.in_flight: dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(image_data: bytes) -> str:
+        """
+        Get the cache key for an image
+
+        :param image_data: The decoded image bytes
+        :return: The cache key
+        """
+        return blake2b(image_data, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Get the URL of an uploaded image if it has not expired yet
+
+        :param key: The cache key of the image
+        :return: The URL, or None if the image is not cached
+        """
+        with self.lock:
+            return self._get(key)
+
+    def expires_in(self, key: str) -> float | None:
+        """
+        Get the number of seconds until a cached URL expires, without counting it as a use
+
+        :param key: The cache key of the image
+        :return: The remaining seconds, or None if the image is not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        remaining = self.ttl - (time() - entry[1])
+        return remaining if remaining > 0 else None
+
+    def put(self, key: str, url: str) -> None:
+        """
+        Store the URL of an uploaded image
+
+        :param key: The cache key of the image
+        :param url: The URL the image was uploaded to
+        """
+        with self.lock:
+            self._put(key, url)
+            self.save()
+
+    def get_or_upload(self, key: str, upload: Callable[[], str]) -> str:
+        """
+        Get the URL of an image, uploading it if it is not cached
+
+        Concurrent calls for the same key share a single upload
+
+        :param key: The cache key of the image
+        :param upload: Uploads the image and returns its URL
+        :return: The URL of the uploaded image
+        """
+        with self.lock:
+            url = self._get(key)
+            if url is not None:
+                return url
+
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            url = upload()
+        except Exception as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self._put(key, url)
+            del self.in_flight[key]
+        # Waiting callers get the URL even if it cannot be written to disk
+        future.set_result(url)
+
+        with self.lock:
+            self.save()
+        return url
+
+    def load(self) -> None:
+        """
+        Load the cache entries from disk, dropping the expired ones
+        """
+        if not exists(self.cache_file_path):
+            return
+
+        try:
+            with open(self.cache_file_path, "r") as f:
+                stored = loads(f.read())
+        except (OSError, ValueError):
+            return
+
+        now = time()
+        try:
+            for key, (url, uploaded_at) in stored.items():
+                if now - uploaded_at < self.ttl:
+                    self.entries[key] = (url, uploaded_at)
+        except (AttributeError, TypeError, ValueError):
+            # A malformed cache file only costs the uploads being redone
+            self.entries.clear()
+            return
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        Write the cache entries to disk, must be called while holding the lock
+
+        The entries stay cached in memory if they cannot be written
+        """
+        temp_file_path = f"{self.cache_file_path}.tmp"
+        try:
+            with open(temp_file_path, "w") as f:
+                f.write(dumps(self.entries))
+            replace(temp_file_path, self.cache_file_path)
+        except OSError:
+            pass
+
+    def _get(self, key: str) -> str | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        url, uploaded_at = entry
+        if time() - uploaded_at >= self.ttl:
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return url
+
+    def _put(self, key: str, url: str) -> None:
+        self.entries[key] = (url, time())
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,178 @@
+try:
+    # orjson is considerably faster than the standard library, but optional
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+EVENT_TYPE_KEY = '"eventType"'
+NUMBER_CHARACTERS = frozenset("-+.0123456789eE")
+
+
+class LazyField:
+    """
+    A large JSON string value that is only sliced out of its message when it is needed
+    """
+
+    __slots__ = ("message", "start", "end")
+
+    def __init__(self, message: str, start: int, end: int) -> None:
+        """
+        :param message: The raw JSON message
+        :param start: The index of the opening quote of the value
+        :param end: The index of the closing quote of the value
+        """
+        self.message = message
+        self.start = start
+        self.end = end
+
+    @property
+    def value(self) -> str:
+        """
+        Decode the value
+
+        :return: The string value
+        """
+        raw = self.message[self.start + 1 : self.end]
+        if "\\" in raw:
+            # Some serializers escape "/" as "\/", which is common in base64
+            return loads(self.message[self.start : self.end + 1])
+        return raw
+
+    def __len__(self) -> int:
+        return self.end - self.start - 1
+
+    def __repr__(self) -> str:
+        return f"<{len(self)} characters>"
+
+
+class EventDecoder:
+    """
+    Decodes messages from the SynthRiders WebSocket
+
+    The event type is read without parsing the message, so events nobody handles are skipped,
+    and large fields such as the album art are kept as lazy slices instead of being parsed
+    """
+
+    def __init__(self, handled_event_types: set[str], lazy_fields: set[str]) -> None:
+        """
+        Create a new decoder
+
+        :param handled_event_types: The event types to decode, all others are skipped
+        :param lazy_fields: Keys of string values that are returned as `LazyField`s
+        """
+        self.handled_event_types = handled_event_types
+        self.lazy_keys = [f'"{field}"' for field in lazy_fields]
+
+    def decode(self, message: str | bytes) -> dict | None:
+        """
+        Decode a message
+
+        :param message: The raw JSON message
+        :return: The decoded event, or None if nobody handles its type
+        """
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+
+        event_type = self.sniff_event_type(message)
+        if event_type is not None and event_type not in self.handled_event_types:
+            return None
+
+        lazy_fields = {}
+        for key in self.lazy_keys:
+            span = self.find_string_value(message, key)
+            if span is None:
+                continue
+
+            # Parse the message with the value replaced by null, then put the lazy slice in its place
+            start, end = span
+            lazy_fields[key[1:-1]] = LazyField(message, start, end)
+            message = f"{message[:start]}null{message[end + 1:]}"
+
+        data = loads(message)
+        if lazy_fields:
+            event_data = data.get("data") or {}
+            for field, lazy_field in lazy_fields.items():
+                # The key may belong to a nested object other than "data"
+                if field in event_data:
+                    event_data[field] = lazy_field
+                    continue
+                data[field] = lazy_field
+        return data
+
+    @staticmethod
+    def sniff_event_type(message: str) -> str | None:
+        """
+        Read the event type without parsing the message
+
+        :param message: The raw JSON message
+        :return: The event type, or None if it could not be found
+        """
+        span = EventDecoder.find_string_value(message, EVENT_TYPE_KEY)
+        if span is None:
+            return None
+        return message[span[0] + 1 : span[1]]
+
+    @staticmethod
+    def find_string_value(message: str, key: str) -> tuple[int, int] | None:
+        """
+        Find the string value of a quoted key
+
+        :param message: The raw JSON message
+        :param key: The key, including its quotes
+        :return: The indices of the opening and closing quote of the value,
+            or None if the key is missing or its value is not a string
+        """
+        index = message.find(key)
+        if index == -1:
+            return None
+
+        index += len(key)
+        length = len(message)
+        while index < length and message[index] in " \t\r\n:":
+            index += 1
+        if index >= length or message[index] != '"':
+            return None
+
+        start = index
+        end = message.find('"', start + 1)
+        # Skip escaped quotes, i.e. quotes preceded by an odd number of backslashes
+        while end != -1:
+            backslashes = 0
+            while message[end - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return start, end
+            end = message.find('"', end + 1)
+        return None
+
+    @staticmethod
+    def find_number_value(message: str, key: str) -> int | float | None:
+        """
+        Read the number value of a quoted key without parsing the message
+
+        :param message: The raw JSON message
+        :param key: The key, including its quotes
+        :return: The number, or None if the key is missing or its value is not a number
+        """
+        index = message.find(key)
+        if index == -1:
+            return None
+
+        index += len(key)
+        length = len(message)
+        while index < length and message[index] in " \t\r\n:":
+            index += 1
+        start = index
+        while index < length and message[index] in NUMBER_CHARACTERS:
+            index += 1
+
+        number = message[start:index]
+        try:
+            return int(number)
+        except ValueError:
+            pass
+        try:
+            return float(number)
+        except ValueError:
+            return None
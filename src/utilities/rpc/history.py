@@ -0,0 +1,240 @@
+import atexit
+import sqlite3
+import threading
+from dataclasses import dataclass
+from os import makedirs
+from os.path import dirname
+from queue import Empty, Queue
+from time import monotonic
+
+from src.utilities.rpc.logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL COLLATE NOCASE,
+    artist TEXT NOT NULL COLLATE NOCASE,
+    mapper TEXT NOT NULL COLLATE NOCASE,
+    difficulty TEXT NOT NULL COLLATE NOCASE,
+    score INTEGER NOT NULL,
+    max_combo INTEGER NOT NULL,
+    life REAL NOT NULL,
+    duration REAL NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    completed INTEGER NOT NULL
+);
+-- Both cover the columns of play_counts, so it never reads the table itself
+CREATE INDEX IF NOT EXISTS plays_by_song ON plays (title, artist, mapper, difficulty, score DESC, started_at);
+CREATE INDEX IF NOT EXISTS plays_by_date ON plays (started_at, title, artist, mapper, score);
+CREATE INDEX IF NOT EXISTS plays_by_score ON plays (score DESC);
+"""
+
+INSERT = """
+INSERT INTO plays (
+    title, artist, mapper, difficulty, score, max_combo, life, duration, started_at, ended_at, completed
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Play:
+    """
+    A finished play of a song
+    """
+
+    title: str
+    artist: str
+    mapper: str
+    difficulty: str
+    score: int
+    max_combo: int
+    life: float
+    # Seconds of the song that were played
+    duration: float
+    started_at: float
+    ended_at: float
+    # False if the song was left before its end
+    completed: bool
+
+
+def open_history(database_path: str) -> sqlite3.Connection:
+    """
+    Open the play history database, creating it if it doesn't exist
+
+    :param database_path: The path of the database file
+    :return: The connection, returning rows that can be accessed by column name
+    """
+    makedirs(dirname(database_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(database_path, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    # Readers don't block the writer, and a commit only waits for the disk at checkpoints
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def top_scores(
+    connection: sqlite3.Connection,
+    limit: int,
+    title: str | None = None,
+    difficulty: str | None = None,
+    since: float | None = None,
+) -> list[sqlite3.Row]:
+    """
+    Get the plays with the highest scores
+
+    :param connection: The connection to the play history
+    :param limit: The maximum number of plays
+    :param title: Only plays of songs with this title, ignoring case
+    :param difficulty: Only plays on this difficulty, ignoring case
+    :param since: Only plays started after this timestamp
+    :return: The plays, highest score first
+    """
+    conditions, parameters = [], []
+    if title is not None:
+        conditions.append("title = ?")
+        parameters.append(title)
+    if difficulty is not None:
+        conditions.append("difficulty = ?")
+        parameters.append(difficulty)
+    if since is not None:
+        conditions.append("started_at >= ?")
+        parameters.append(since)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return connection.execute(
+        f"SELECT * FROM plays {where} ORDER BY score DESC LIMIT ?", (*parameters, limit)
+    ).fetchall()
+
+
+def play_counts(
+    connection: sqlite3.Connection, limit: int, since: float | None = None
+) -> list[sqlite3.Row]:
+    """
+    Get the most played songs
+
+    :param connection: The connection to the play history
+    :param limit: The maximum number of songs
+    :param since: Only count plays started after this timestamp
+    :return: The songs with their play count, best score and last play, most played first
+    """
+    where, parameters = ("WHERE started_at >= ?", (since,)) if since is not None else ("", ())
+    return connection.execute(
+        f"""
+        SELECT title, artist, mapper, COUNT(*) AS plays, MAX(score) AS best_score,
+            MAX(started_at) AS last_played
+        FROM plays {where}
+        GROUP BY title, artist, mapper
+        ORDER BY plays DESC, last_played DESC
+        LIMIT ?
+        """,
+        (*parameters, limit),
+    ).fetchall()
+
+
+class PlayHistory:
+    """
+    Records finished plays in a SQLite database
+
+    Plays are queued by the event handling and written in batches by a background thread,
+    so the event path never waits on the disk. The writer thread is started with the first play
+    """
+
+    STOP = object()
+
+    def __init__(
+        self, database_path: str, logger: Logger, batch_size: int, flush_interval: float
+    ) -> None:
+        """
+        Create a new play history
+
+        :param database_path: The path of the database file
+        :param logger: The logger to report failed writes to
+        :param batch_size: The maximum number of plays written in one transaction
+        :param flush_interval: Seconds a play waits for more plays to be written with it
+        """
+        self.database_path = database_path
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.written = 0
+
+    def record(self, play: Play) -> None:
+        """
+        Queue a play to be written
+
+        :param play: The finished play
+        """
+        if self.thread is None:
+            self.start()
+        self.queue.put(play)
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name="PlayHistory", daemon=True)
+            self.thread.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """
+        Write the queued plays and stop the writer thread
+        """
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.queue.put(self.STOP)
+        self.thread.join(timeout=5)
+
+    def run(self) -> None:
+        try:
+            connection = open_history(self.database_path)
+        except sqlite3.Error as e:
+            self.logger.error(f"Could not open the play history: {e}")
+            return
+        stopped = False
+        while not stopped:
+            play = self.queue.get()
+            if play is self.STOP:
+                break
+
+            batch = [play]
+            deadline = monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    play = self.queue.get(timeout=max(0.0, deadline - monotonic()))
+                except Empty:
+                    break
+                if play is self.STOP:
+                    stopped = True
+                    break
+                batch.append(play)
+
+            try:
+                with connection:
+                    connection.executemany(INSERT, [
+                        (
+                            play.title,
+                            play.artist,
+                            play.mapper,
+                            play.difficulty,
+                            play.score,
+                            play.max_combo,
+                            play.life,
+                            play.duration,
+                            play.started_at,
+                            play.ended_at,
+                            play.completed,
+                        )
+                        for play in batch
+                    ])
+            except sqlite3.Error as e:
+                self.logger.error(f"Could not write {len(batch)} plays to the play history: {e}")
+                continue
+            self.written += len(batch)
+        connection.close()
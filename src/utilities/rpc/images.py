@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+try:
+    # Pillow is optional, without it album art is uploaded as it is
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def shrink_image(
+    image_data: bytes, image_type: str, max_size: int, quality: int
+) -> tuple[bytes, str]:
+    """
+    Downscale an image to fit into a square and re-encode it as JPEG
+
+    Runs in a worker process, so it must stay a module level function
+
+    :param image_data: The encoded image
+    :param image_type: The image type, e.g. "png"
+    :param max_size: The maximum width and height in pixels
+    :param quality: The JPEG quality
+    :return: The shrunk image and its type, or the original if shrinking didn't make it smaller
+    """
+    with Image.open(BytesIO(image_data)) as image:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no transparency, covers are shown on a dark background
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (0, 0, 0))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        output = BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+
+    shrunk = output.getvalue()
+    if len(shrunk) >= len(image_data):
+        return image_data, image_type
+    return shrunk, "jpeg"
+
+
+class ImageShrinker:
+    """
+    Shrinks album art before it is uploaded, since Discord only shows it as a small thumbnail
+
+    Decoding and encoding images holds the GIL for a long time, so it runs in a worker process
+    instead of stalling the WebSocket thread. The process is started with the first image,
+    and replaced when it dies or stops answering
+    """
+
+    def __init__(self, max_size: int, quality: int, timeout: float = 10) -> None:
+        """
+        Create a new image shrinker
+
+        :param max_size: The maximum width and height in pixels, 0 disables shrinking
+        :param quality: The JPEG quality
+        :param timeout: Seconds to wait for a shrunk image before giving up on the worker process
+        """
+        self.max_size = max_size
+        self.quality = quality
+        self.timeout = timeout
+        self.executor = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.max_size > 0
+
+    def submit(self, image_data: bytes, image_type: str) -> Future:
+        """
+        Shrink an image in the worker process
+
+        :param image_data: The encoded image
+        :param image_type: The image type
+        :return: A future of the shrunk image and its type
+        """
+        if not self.enabled:
+            future = Future()
+            future.set_result((image_data, image_type))
+            return future
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=1)
+            executor = self.executor
+        try:
+            return executor.submit(
+                shrink_image, image_data, image_type, self.max_size, self.quality
+            )
+        except BrokenProcessPool:
+            # The worker process died, e.g. it was killed, so start over with a new one
+            return self.restart(executor).submit(
+                shrink_image, image_data, image_type, self.max_size, self.quality
+            )
+
+    def shrink(self, image_data: bytes, image_type: str) -> tuple[bytes, str]:
+        """
+        Shrink an image and wait for the result
+
+        :param image_data: The encoded image
+        :param image_type: The image type
+        :return: The shrunk image and its type
+        :raises TimeoutError: If the worker process didn't answer in time, it is replaced
+        """
+        future = self.submit(image_data, image_type)
+        executor = self.executor
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.restart(executor)
+            raise TimeoutError(f"The worker process took longer than {self.timeout}s") from None
+
+    def restart(self, executor: ProcessPoolExecutor | None) -> ProcessPoolExecutor:
+        """
+        Replace a broken or hung worker process, unless another thread already replaced it
+
+        :param executor: The executor that failed
+        :return: The executor to use from now on
+        """
+        with self.lock:
+            if self.executor is executor or self.executor is None:
+                if executor is not None:
+                    self.stop_executor(executor)
+                self.executor = ProcessPoolExecutor(max_workers=1)
+            return self.executor
+
+    @staticmethod
+    def stop_executor(executor: ProcessPoolExecutor) -> None:
+        terminate_workers = getattr(executor, "terminate_workers", None)
+        if terminate_workers is not None:
+            terminate_workers()
+            return
+        # Shutting down alone would leave a hung worker process running, and there is
+        # no public way to kill it before Python 3.14
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
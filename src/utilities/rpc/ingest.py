@@ -0,0 +1,120 @@
+import threading
+from collections import deque
+from typing import Any, Callable
+
+
+class NoteHits:
+    """
+    The note hits received while their NoteHit events wait in one buffer slot
+
+    Coalescing keeps only the latest NoteHit, so every hit is read when it is received
+    and collected here, for the stats that need all of them, such as the peak combo
+    """
+
+    __slots__ = ("hits", "peak_combo", "capacity")
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Create an empty collection of note hits
+
+        :param capacity: The maximum number of hits kept, older ones are dropped but still count for the peak combo
+        """
+        # (received at, score, combo, life) per hit
+        self.hits: list[tuple[float, int, int, float]] = []
+        self.peak_combo = 0
+        self.capacity = capacity
+
+    def add(self, received_at: float, score: int, combo: int, life: float) -> None:
+        self.hits.append((received_at, score, combo, life))
+        if combo > self.peak_combo:
+            self.peak_combo = combo
+        if len(self.hits) > self.capacity:
+            del self.hits[0]
+
+
+class EventBuffer:
+    """
+    Buffers WebSocket events between the receiving thread and the state processing
+
+    Events that carry absolute values, such as NoteHit and PlayTime, only matter in their latest
+    version, so a newer one overwrites the one still waiting in its slot. All other events are
+    transitions and are kept in order. A transition starts new slots, so events are never moved
+    across a song change. When the consumer falls behind by more than `max_pending` entries,
+    the oldest entries are dropped
+    """
+
+    def __init__(
+        self,
+        overwrite_types: set[str],
+        max_pending: int,
+        merge: Callable[[Any, Any], Any] | None = None,
+    ) -> None:
+        """
+        Create a new event buffer
+
+        :param overwrite_types: The event types of which only the latest one is kept
+        :param max_pending: The maximum number of buffered entries
+        :param merge: Combines the item waiting in a slot with a newer one,
+            by default the newer one replaces it
+        """
+        self.overwrite_types = overwrite_types
+        self.max_pending = max_pending
+        self.merge = merge
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        # [event type, item] entries, mutable so a slot can be overwritten in place
+        self.pending = deque()
+        self.slots: dict[str, list] = {}
+        # Increased by clear(), so a consumer can tell that its drained entries are stale
+        self.generation = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, event_type: str | None, item) -> None:
+        """
+        Buffer an event
+
+        :param event_type: The event type
+        :param item: The event, passed back by `drain`
+        """
+        with self.lock:
+            if event_type in self.overwrite_types:
+                slot = self.slots.get(event_type)
+                if slot is not None:
+                    slot[1] = item if self.merge is None else self.merge(slot[1], item)
+                    self.coalesced += 1
+                    return
+                entry = self.slots[event_type] = [event_type, item]
+            else:
+                entry = [event_type, item]
+                self.slots = {}
+
+            if len(self.pending) >= self.max_pending:
+                dropped = self.pending.popleft()
+                self.dropped += 1
+                if self.slots.get(dropped[0]) is dropped:
+                    del self.slots[dropped[0]]
+            self.pending.append(entry)
+        self.ready.set()
+
+    def drain(self) -> tuple[int, list[list]]:
+        """
+        Take all buffered events
+
+        :return: The generation of the buffer and the [event type, item] entries in order
+        """
+        with self.lock:
+            entries = list(self.pending)
+            self.pending.clear()
+            self.slots = {}
+            self.ready.clear()
+            return self.generation, entries
+
+    def clear(self) -> None:
+        """
+        Drop all buffered events, including the ones a consumer has drained but not processed yet
+        """
+        with self.lock:
+            self.pending.clear()
+            self.slots = {}
+            self.generation += 1
@@ -0,0 +1,205 @@
+import math
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from json import dump, load, loads
+from os.path import exists, join, splitext
+
+DIFFICULTIES = ("Easy", "Normal", "Hard", "Expert", "Master", "Custom")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def parse_bpm(value) -> float | None:
+    """
+    Read the BPM of a song, which some maps store as a string or leave empty
+
+    :param value: The BPM as found in the metadata
+    :return: The BPM, or None if it isn't a number
+    """
+    try:
+        bpm = float(value)
+    except (TypeError, ValueError):
+        return None
+    return bpm if math.isfinite(bpm) else None
+
+
+def read_song_metadata(synth_file_path: str) -> dict | None:
+    """
+    Read the metadata of a custom song without extracting its audio or artwork
+
+    Maps downloaded from synthriderz.com carry a small synthriderz.meta.json entry, which is read
+    instead of the beatmap when it is present.
+    Runs in a worker process, so it must stay a module level function
+
+    :param synth_file_path: The path of the .synth archive
+    :return: The title, artist, mapper, BPM, difficulties and artwork entry name,
+        or None if the archive can't be read
+    """
+    try:
+        with zipfile.ZipFile(synth_file_path) as archive:
+            # Only the central directory and one metadata entry are read
+            names = archive.namelist()
+            images = [name for name in names if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+            if "synthriderz.meta.json" in names:
+                with archive.open("synthriderz.meta.json") as f:
+                    meta = loads(f.read().decode("utf-8-sig"))
+                if not isinstance(meta, dict):
+                    return None
+                return {
+                    "title": meta.get("title", ""),
+                    "artist": meta.get("artist", ""),
+                    "mapper": meta.get("mapper", ""),
+                    "bpm": parse_bpm(meta.get("bpm")),
+                    "difficulties": [
+                        difficulty for difficulty in DIFFICULTIES
+                        if difficulty in (meta.get("difficulties") or [])
+                    ],
+                    "artwork": images[0] if images else None,
+                }
+
+            with archive.open("beatmap.meta.bin") as f:
+                meta = loads(f.read().decode("utf-8-sig"))
+            if not isinstance(meta, dict):
+                return None
+
+            track = meta.get("Track") or {}
+            artwork = meta.get("Artwork")
+            return {
+                "title": meta.get("Name", ""),
+                "artist": meta.get("Author", ""),
+                "mapper": meta.get("Beatmapper", ""),
+                "bpm": parse_bpm(meta.get("BPM")),
+                # A difficulty is mapped if it has any notes
+                "difficulties": [difficulty for difficulty in DIFFICULTIES if track.get(difficulty)],
+                "artwork": artwork if artwork in names else (images[0] if images else None),
+            }
+    except Exception:
+        # A broken archive, e.g. an unsupported compression or unexpected metadata,
+        # must not fail the scan of the whole library
+        return None
+
+
+def read_cover(synth_file_path: str, artwork: str) -> tuple[bytes, str]:
+    """
+    Read the cover image of a custom song
+
+    :param synth_file_path: The path of the .synth archive
+    :param artwork: The name of the image entry, as returned by `read_song_metadata`
+    :return: The image bytes and the image type
+    """
+    with zipfile.ZipFile(synth_file_path) as archive:
+        image_data = archive.read(artwork)
+    image_type = splitext(artwork)[1][1:].lower()
+    return image_data, "jpeg" if image_type == "jpg" else image_type
+
+
+class SongLibrary:
+    """
+    Index of the custom songs in the game's CustomSongs folder
+
+    Archives are read in parallel in a process pool. The index is stored on disk keyed by path,
+    modification time and size, so a rescan only reads new and changed archives.
+    Songs are looked up by title, artist and mapper, as sent by SongStart events
+    """
+
+    def __init__(self, custom_songs_folder: str, index_folder: str, workers: int) -> None:
+        """
+        Create a new song library and load the index stored on disk
+
+        :param custom_songs_folder: The folder of the .synth archives
+        :param index_folder: The folder to store the index file in
+        :param workers: The number of worker processes reading archives
+        """
+        os.makedirs(index_folder, exist_ok=True)
+        self.custom_songs_folder = custom_songs_folder
+        self.index_file_path = join(index_folder, "library.json")
+        self.workers = workers
+        # path -> {"mtime", "size", "song"}
+        self.entries: dict[str, dict] = {}
+        self.songs_by_key: dict[tuple[str, str, str], dict] = {}
+        self.load()
+
+    def find(self, title: str, artist: str, mapper: str) -> dict | None:
+        """
+        Find a song by the fields of a SongStart event
+
+        :param title: The song title
+        :param artist: The song artist
+        :param mapper: The beatmapper
+        :return: The song metadata, or None if the song is not in the library
+        """
+        return self.songs_by_key.get(self.key(title, artist, mapper))
+
+    def scan(self) -> tuple[int, int]:
+        """
+        Rescan the custom songs folder, reading only new and changed archives
+
+        :return: The number of read and removed archives
+        """
+        if not exists(self.custom_songs_folder):
+            return 0, 0
+
+        entries = {}
+        changed = []
+        with os.scandir(self.custom_songs_folder) as files:
+            for file in files:
+                if not file.is_file() or not file.name.lower().endswith(".synth"):
+                    continue
+                stat = file.stat()
+                entry = self.entries.get(file.path)
+                if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    entries[file.path] = entry
+                else:
+                    entries[file.path] = {"mtime": stat.st_mtime, "size": stat.st_size, "song": None}
+                    changed.append(file.path)
+
+        if changed:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(changed))) as executor:
+                songs = executor.map(read_song_metadata, changed, chunksize=32)
+                for path, song in zip(changed, songs):
+                    entries[path]["song"] = song
+
+        removed = len(self.entries.keys() - entries.keys())
+        # Replaced as a whole, so lookups from other threads never see a half updated index
+        self.entries = entries
+        self.songs_by_key = self.build_lookup(entries)
+        if changed or removed:
+            self.save()
+        return len(changed), removed
+
+    def load(self) -> None:
+        if not exists(self.index_file_path):
+            return
+        try:
+            with open(self.index_file_path, "r", encoding="utf-8") as f:
+                entries = load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = entries
+        self.songs_by_key = self.build_lookup(entries)
+
+    def save(self) -> None:
+        temporary_path = f"{self.index_file_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            dump(self.entries, f)
+        os.replace(temporary_path, self.index_file_path)
+
+    def build_lookup(self, entries: dict[str, dict]) -> dict[tuple[str, str, str], dict]:
+        lookup = {}
+        for path, entry in entries.items():
+            song = entry["song"]
+            if song is not None:
+                # Indexes written before the BPM was parsed may still hold it as found in the archive
+                lookup[self.key(song["title"], song["artist"], song["mapper"])] = {
+                    **song, "bpm": parse_bpm(song.get("bpm")), "path": path
+                }
+        return lookup
+
+    @staticmethod
+    def key(title: str, artist: str, mapper: str) -> tuple[str, str, str]:
+        return (
+            (title or "").strip().casefold(),
+            (artist or "").strip().casefold(),
+            (mapper or "").strip().casefold(),
+        )
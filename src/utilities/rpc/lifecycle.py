@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class Lifecycle(Enum):
+    """
+    The states the RPC moves through
+
+    WAITING_FOR_DISCORD -> WAITING_FOR_GAME -> IN_GAME -> GAME_EXITED,
+    then back to WAITING_FOR_GAME in keep running mode. Losing the Discord connection
+    in any state goes back to WAITING_FOR_DISCORD
+    """
+
+    WAITING_FOR_DISCORD = "Waiting for Discord"
+    WAITING_FOR_GAME = "Waiting for Synth Riders"
+    IN_GAME = "In game"
+    GAME_EXITED = "Synth Riders exited"
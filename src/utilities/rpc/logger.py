@@ -1,59 +1,202 @@
+import atexit
+import gzip
+import shutil
 import sys
-from os import makedirs
-from os.path import join, dirname, abspath
+import threading
+from os import makedirs, remove, replace
+from os.path import join, dirname, abspath, exists, getsize
 from datetime import datetime
+from queue import Queue, Empty
+from time import monotonic
 
 
 class Logger:
     """
     Handles application logging
+
+    Logging only puts the message on a queue. A background thread prints the messages and
+    writes them in batches to one open log file, which is rotated and compressed once it
+    grows too large. Long messages are clipped and repeated messages are only counted
     """
 
     log_file_path: str
 
+    # Asks the writer thread to rotate the log file
+    ROTATE = object()
+
     def __init__(
         self,
         log_folder: str = join(abspath(dirname(sys.executable)), "logs"),
+        max_bytes: int = 1024 * 1024,
+        backup_count: int = 3,
+        clip_length: int = 1000,
+        repeat_window: float = 10,
     ):
         """
         Create a new logger instance
 
         :param log_folder: The path to the log folder
+        :param max_bytes: The log file size at which it is rotated
+        :param backup_count: The number of compressed old log files to keep
+        :param clip_length: The maximum length of a logged message
+        :param repeat_window: Seconds within which an identical message is only counted
         """
         makedirs(log_folder, exist_ok=True)
         self.log_folder = log_folder
         self.log_file_path = join(log_folder, "log.txt")
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.clip_length = clip_length
+        self.repeat_window = repeat_window
+
+        self.messages = Queue()
+        self.log_file = None
+        self.last_message = None
+        self.last_message_at = 0
+        self.repeated = 0
+        self.thread = threading.Thread(
+            target=self.write_messages, name="Logger", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.close)
 
     def error(self, message: str):
         """
         Log an error message
         """
         self.write("ERROR", message)
-        print(f"ERROR: {message}")
 
     def warning(self, message: str):
         """
         Log a warning message
         """
         self.write("WARNING", message)
-        print(f"WARNING: {message}")
 
     def info(self, message: str):
         """
         Log an info message
         """
         self.write("INFO", message)
-        print(f"INFO: {message}")
 
     def write(self, type: str, message: str):
         """
-        Write a message to the log file
+        Queue a message for the log file
         """
-        with open(self.log_file_path, "a") as log_file:
-            log_file.write(f"[{type}] [{datetime.now()}] {message}\n")
+        self.messages.put((type, datetime.now(), message))
 
     def clear(self):
         """
-        Clear the log file of all content
+        Start a new log file, the previous one is kept as a compressed backup
+        """
+        self.messages.put(self.ROTATE)
+
+    def close(self):
+        """
+        Write the pending messages and close the log file
         """
-        open(self.log_file_path, "w").close()
+        if self.thread.is_alive():
+            self.messages.put(None)
+            self.thread.join()
+
+    def write_messages(self):
+        while True:
+            # Write everything that is queued at once, then flush
+            batch = [self.messages.get()]
+            try:
+                while len(batch) < 256:
+                    batch.append(self.messages.get_nowait())
+            except Empty:
+                pass
+
+            try:
+                for item in batch:
+                    if item is None:
+                        self.write_repeated()
+                        if self.log_file is not None:
+                            self.log_file.close()
+                            self.log_file = None
+                        return
+                    if item is self.ROTATE:
+                        self.write_repeated()
+                        self.rotate()
+                        continue
+                    self.write_line(*item)
+
+                if self.log_file is not None:
+                    self.log_file.flush()
+                # The executable has no console, so there is no stdout to write to
+                if sys.stdout is not None:
+                    sys.stdout.flush()
+            except Exception:
+                # Losing a batch is better than losing every later message, so the log
+                # file is reopened for the next batch
+                self.discard_log_file()
+
+    def discard_log_file(self):
+        if self.log_file is None:
+            return
+        try:
+            self.log_file.close()
+        except OSError:
+            pass
+        self.log_file = None
+
+    def write_line(self, type: str, timestamp: datetime, message: str):
+        message = self.clip(message)
+
+        now = monotonic()
+        if (type, message) == self.last_message and now - self.last_message_at < self.repeat_window:
+            self.repeated += 1
+            return
+        self.write_repeated()
+        self.last_message = (type, message)
+        self.last_message_at = now
+
+        if sys.stdout is not None:
+            print(f"{type}: {message}")
+        self.append(f"[{type}] [{timestamp}] {message}\n")
+
+    def write_repeated(self):
+        if not self.repeated:
+            return
+        type, message = self.last_message
+        line = f"Last message repeated {self.repeated} times"
+        self.repeated = 0
+        if sys.stdout is not None:
+            print(f"{type}: {line}")
+        self.append(f"[{type}] [{datetime.now()}] {line}\n")
+
+    def append(self, line: str):
+        if self.log_file is None:
+            self.log_file = open(self.log_file_path, "a", encoding="utf-8")
+        self.log_file.write(line)
+        if self.log_file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def clip(self, message: str) -> str:
+        if len(message) <= self.clip_length:
+            return message
+        return f"{message[:self.clip_length]}... ({len(message) - self.clip_length} characters clipped)"
+
+    def rotate(self):
+        """
+        Compress the log file to log.txt.1.gz, shifting the older backups
+        """
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+        if not exists(self.log_file_path) or getsize(self.log_file_path) == 0:
+            return
+
+        oldest = f"{self.log_file_path}.{self.backup_count}.gz"
+        if exists(oldest):
+            remove(oldest)
+        for index in range(self.backup_count - 1, 0, -1):
+            backup = f"{self.log_file_path}.{index}.gz"
+            if exists(backup):
+                replace(backup, f"{self.log_file_path}.{index + 1}.gz")
+
+        if self.backup_count > 0:
+            with open(self.log_file_path, "rb") as source, gzip.open(f"{self.log_file_path}.1.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+        remove(self.log_file_path)
@@ -0,0 +1,249 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Callable, Iterator
+
+
+# Upper bounds in seconds, from the sub-millisecond NoteHit handling up to slow uploads
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30,
+)
+
+
+class Counter:
+    """
+    A monotonically increasing count
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """
+    A Prometheus style histogram of observed values
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        :param buckets: The sorted upper bounds of the buckets
+        """
+        self.buckets = buckets
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Counters and histograms describing how the RPC behaves, rendered in the Prometheus text format
+
+    Metric names are prefixed with `synthriders_rpc_`. Labels are passed as keyword arguments
+    and must always be passed in the same order for the same metric.
+    `inc` and `observe` are safe to call from any thread. Hot paths instead keep the `Counter`
+    or `Histogram` returned by `counter` and `histogram` and update it without locking,
+    which is only safe from the single thread that owns the metric
+    """
+
+    PREFIX = "synthriders_rpc_"
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: dict[tuple[str, tuple], Counter] = {}
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+        self.descriptions: dict[str, str] = {}
+
+    def describe(self, name: str, description: str) -> None:
+        """
+        Set the help text of a metric
+
+        :param name: The metric name without prefix
+        :param description: The help text
+        """
+        self.descriptions[name] = description
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        """
+        Get a counter, creating it if needed
+
+        :param name: The counter name without prefix, ending in `_total`
+        :param labels: The labels of the counter
+        :return: The counter
+        """
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = Counter()
+            return counter
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """
+        Get a histogram, creating it if needed
+
+        :param name: The histogram name without prefix, ending in its unit
+        :param labels: The labels of the histogram
+        :return: The histogram
+        """
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            return histogram
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Increment a counter
+
+        :param name: The counter name without prefix, ending in `_total`
+        :param amount: The amount to add
+        :param labels: The labels of the counter
+        """
+        counter = self.counter(name, **labels)
+        with self.lock:
+            counter.inc(amount)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Add a value to a histogram
+
+        :param name: The histogram name without prefix, ending in its unit
+        :param value: The observed value
+        :param labels: The labels of the histogram
+        """
+        histogram = self.histogram(name, **labels)
+        with self.lock:
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Observe how long the block takes, in seconds
+
+        :param name: The histogram name without prefix, ending in `_seconds`
+        :param labels: The labels of the histogram
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - started, **labels)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """
+        Register a value that is read when the metrics are rendered
+
+        :param name: The gauge name without prefix
+        :param read: Returns the current value
+        """
+        self.gauges[name] = read
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text format
+
+        :return: The metrics text
+        """
+        with self.lock:
+            counters = {key: counter.value for key, counter in self.counters.items()}
+            histograms = {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in self.histograms.items()
+            }
+
+        lines = []
+        described = set()
+
+        def header(name: str, type: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            if name in self.descriptions:
+                lines.append(f"# HELP {self.PREFIX}{name} {self.descriptions[name]}")
+            lines.append(f"# TYPE {self.PREFIX}{name} {type}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{self.PREFIX}{name}{self.format_labels(labels)} {value:g}")
+
+        for name, read in sorted(self.gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{self.PREFIX}{name} {read():g}")
+
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(
+                    f"{self.PREFIX}{name}_bucket{self.format_labels((*labels, ('le', le)))} {cumulative}"
+                )
+            lines.append(f"{self.PREFIX}{name}_sum{self.format_labels(labels)} {total:g}")
+            lines.append(f"{self.PREFIX}{name}_count{self.format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class MetricsServer:
+    """
+    Serves the metrics on localhost in the Prometheus text format
+    """
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1") -> None:
+        """
+        Create a new metrics server
+
+        :param metrics: The metrics to serve
+        :param port: The port to listen on
+        :param host: The host to listen on, only localhost by default
+        """
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_port}/metrics"
+
+    def start(self) -> None:
+        threading.Thread(
+            target=self.server.serve_forever, name="MetricsServer", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
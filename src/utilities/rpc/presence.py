@@ -1,65 +1,414 @@
 import os
-import re
-# from sqlite3 import Connection
-from time import sleep, time
+import sys
+from collections import deque
+from datetime import datetime
+from os import makedirs
+from os.path import join, dirname, abspath
+from time import perf_counter, sleep, time
 
-from psutil import NoSuchProcess, Process, pids
 from pypresence import Presence as PyPresence
+from pypresence.exceptions import PyPresenceException
 
 from config import Config
 from src.utilities.rpc import (
+    ArtWarmer,
     DiscordAssets,
+    EventBuffer,
+    NoteHits,
+    ImageShrinker,
+    EventDecoder,
+    LazyField,
+    Lifecycle,
     Logger,
+    ImageUploader,
+    LaunchDetector,
+    Metrics,
+    MetricsServer,
+    NoteTelemetry,
+    Play,
+    PlayHistory,
+    PresencePublisher,
+    ProcessWatcher,
+    Profiler,
+    ReconnectBackoff,
+    RollingStats,
+    SongLibrary,
+    GameState,
+    PlayState,
+    SessionRecorder,
+    SongState,
+    Tracer,
+    UploadCache,
+    WebSocketSupervisor,
 )
+from src.utilities.rpc.tracing import NO_SPAN
 
 # required for Synth Riders
-import json
 import threading
 import time
 
-from websocket import WebSocketApp
 
 # required for image upload
 import requests
-import base64
-import tempfile
+from requests.adapters import HTTPAdapter
+import binascii
+from io import BytesIO
 
 
 class Presence:
+    HANDLED_EVENT_TYPES = {
+        "SongStart",
+        "SongEnd",
+        "ReturnToMenu",
+        "PlayTime",
+        "NoteHit",
+        "SceneChange",
+    }
+    # Events carrying absolute values, only the latest one waiting for processing is kept
+    COALESCED_EVENT_TYPES = {"NoteHit", "PlayTime"}
+
     logger: Logger
     presence: PyPresence
-    ws = None
-    current_song = None
-    song_progress = 0
-    song_length = 0
-    score = 0
-    combo = 0
-    life = 1.0
-    lock = threading.Lock()
+    state = GameState()
     connected = False
     start_time = 0
+    lifecycle: Lifecycle | None = None
+    recorder: SessionRecorder | None = None
+    tracer: Tracer | None = None
+    profiler: Profiler | None = None
+    # The id of the event being handled, set by the WebSocket thread while tracing
+    traced_event_id = 0
 
     def __init__(self, config: dict) -> None:
         self.config = config
-        self.logger = Logger()
+        # Serializes the writers of the game state, readers take the current snapshot without locking
+        self.state_lock = threading.Lock()
+        self.metrics = Metrics()
+        self.install_folder = self.config.get(
+            "rich_presence_install_location"
+        ) or abspath(dirname(sys.executable))
+        self.logger = Logger(
+            join(self.install_folder, "logs"),
+            Config.LOG_MAX_BYTES,
+            Config.LOG_BACKUP_COUNT,
+            Config.LOG_CLIP_LENGTH,
+            Config.LOG_REPEAT_WINDOW,
+        )
+        self.upload_cache = UploadCache(
+            join(self.install_folder, "cache"),
+            Config.IMAGE_CACHE_TTL,
+            Config.IMAGE_CACHE_MAX_ENTRIES,
+        )
+        self.session = self.create_session()
+        self.shrinker = ImageShrinker(
+            self.config.get("image_max_size", Config.IMAGE_MAX_SIZE),
+            Config.IMAGE_JPEG_QUALITY,
+            Config.IMAGE_SHRINK_TIMEOUT,
+        )
+        self.uploader = ImageUploader(
+            lambda album_art: self.upload_base64_image(
+                self.config.get("image_upload_url"), album_art
+            ),
+            self.logger,
+            Config.IMAGE_UPLOAD_WORKERS,
+            Config.IMAGE_UPLOAD_QUEUE_SIZE,
+        )
+
+        self.history = PlayHistory(
+            join(self.install_folder, Config.HISTORY_FILE),
+            self.logger,
+            Config.HISTORY_BATCH_SIZE,
+            Config.HISTORY_FLUSH_INTERVAL,
+        ) if self.config.get("record_play_history", True) else None
 
+        self.rolling_stats = RollingStats(
+            self.config.get("rolling_stats_window", Config.ROLLING_STATS_WINDOW),
+            Config.ROLLING_STATS_CAPACITY,
+        )
+        self.state_template = self.load_template(
+            "presence_state_template", Config.PRESENCE_STATE_TEMPLATE
+        )
+        self.small_text_template = self.load_template(
+            "presence_small_text_template", Config.PRESENCE_SMALL_TEXT_TEMPLATE
+        )
+        self.telemetry = None
+        if self.config.get("capture_note_telemetry"):
+            if NoteTelemetry.available():
+                self.telemetry = NoteTelemetry(
+                    join(self.install_folder, "telemetry"),
+                    self.logger,
+                    Config.TELEMETRY_CAPACITY,
+                    Config.TELEMETRY_BIN_SECONDS,
+                )
+            else:
+                self.logger.warning("Note telemetry needs NumPy, install it to capture note hits")
 
-        self.presence = PyPresence(self.config.get("discord_application_id"))
+        synthriders_install_location = self.config.get("synthriders_install_location")
+        self.library = SongLibrary(
+            join(synthriders_install_location, Config.CUSTOM_SONGS_FOLDER),
+            join(self.install_folder, "cache"),
+            Config.LIBRARY_SCAN_WORKERS,
+        ) if synthriders_install_location else None
+        prewarm_songs = self.config.get("prewarm_album_art_songs", Config.ART_WARM_MAX_SONGS)
+        self.art_warmer = ArtWarmer(
+            self.library,
+            self.upload_cache,
+            self.prewarm_image_data,
+            self.is_idle,
+            self.logger,
+            join(self.install_folder, "cache"),
+            Config.ART_WARM_INTERVAL,
+            prewarm_songs,
+            Config.ART_WARM_REFRESH_MARGIN,
+        ) if self.library is not None and prewarm_songs else None
+
+        game_process_name = self.config.get(
+            "synthriders_process_name", Config.SYNTH_RIDERS_PROCESS_NAME
+        )
+        self.game_process = ProcessWatcher(game_process_name)
+        self.game_launch = LaunchDetector(
+            game_process_name,
+            self.config.get(
+                "game_launch_detection_latency", Config.GAME_LAUNCH_DETECTION_LATENCY
+            ),
+            Config.GAME_LAUNCH_FULL_SCAN_INTERVAL,
+            self.metrics,
+        )
+        self.presence = self.create_discord_client()
+        self.publisher = PresencePublisher(
+            self.render_presence,
+            self.update_presence,
+            Config.PRESENCE_REFRESH_INTERVAL,
+            Config.PRESENCE_COALESCE_DELAY,
+            Config.PRESENCE_RATE_LIMIT,
+            Config.PRESENCE_RATE_PERIOD,
+        )
         self.ws_url = f"ws://{self.config.get("synthriders_websocket_host")}:{self.config.get("synthriders_websocket_port")}"
+        self.decoder = EventDecoder(self.HANDLED_EVENT_TYPES, {"albumArt"})
+        self.events = EventBuffer(
+            self.COALESCED_EVENT_TYPES, Config.EVENT_BUFFER_MAX_PENDING, self.merge_buffered_events
+        )
+        self.event_thread = None
+        self.websocket = self.create_websocket()
+        self.metrics_server = None
+        # Ids of traced events waiting for the next Discord update
+        self.traced_pending_ids = deque()
+        # Received counters by event type, updated by the WebSocket thread only
+        self.received_counters = {}
+        # Handling time histograms by event type, updated by the event processing thread only
+        self.handling_histograms = {}
+        self.lock_wait = self.metrics.histogram("lock_wait_seconds")
+        self.describe_metrics()
+
+    def create_session(self) -> requests.Session | None:
+        """
+        Create the keep-alive session shared by the upload workers
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=Config.IMAGE_UPLOAD_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def create_discord_client(self) -> PyPresence | None:
+        """
+        Create the Discord client
+        """
+        return PyPresence(self.config.get("discord_application_id"))
+
+    def create_websocket(self) -> WebSocketSupervisor | None:
+        """
+        Create the supervisor of the SynthRiders WebSocket connection
+        """
+        return WebSocketSupervisor(
+            self.ws_url,
+            self.handle_websocket_message,
+            self.on_websocket_open,
+            self.on_websocket_close,
+            self.synth_riders_process_exists,
+            ReconnectBackoff(
+                Config.WEBSOCKET_RECONNECT_INITIAL_DELAY,
+                Config.WEBSOCKET_RECONNECT_MAX_DELAY,
+            ),
+            Config.WEBSOCKET_STABLE_CONNECTION,
+        )
+
+    def websocket_reconnect_count(self) -> int:
+        """
+        :return: The number of reconnects to the SynthRiders WebSocket
+        """
+        return self.websocket.reconnect_count
 
     def start(self) -> None:
         """
-        Start the RPC
+        Start the RPC and run its lifecycle until Synth Riders exits, or forever in keep running mode
+        """
+        self.logger.clear()
+        self.start_profiling()
+        self.start_metrics_server()
+        self.start_library_scan()
+        handlers = {
+            Lifecycle.WAITING_FOR_DISCORD: self.wait_for_discord,
+            Lifecycle.WAITING_FOR_GAME: self.wait_for_game,
+            Lifecycle.IN_GAME: self.run_game_session,
+            Lifecycle.GAME_EXITED: self.handle_game_exit,
+        }
+
+        self.lifecycle = Lifecycle.WAITING_FOR_DISCORD
+        while self.lifecycle is not None:
+            try:
+                self.lifecycle = handlers[self.lifecycle]()
+            except (PyPresenceException, OSError) as e:
+                self.logger.error(f"Lost connection to Discord: {e}")
+                self.metrics.inc("discord_reconnects_total")
+                self.lifecycle = Lifecycle.WAITING_FOR_DISCORD
+            except Exception as e:
+                self.logger.error(f"An error occurred: {e}")
+                break
+
+    def describe_metrics(self) -> None:
+        """
+        Describe the metrics of the RPC and register the gauges
+        """
+        self.metrics.describe("events_received_total", "Messages received from the SynthRiders WebSocket by event type")
+        self.metrics.describe("events_coalesced", "NoteHit and PlayTime events replaced by a newer one before processing")
+        self.metrics.describe("events_dropped", "Events dropped because processing fell behind")
+        self.metrics.describe("event_handling_seconds", "Time spent decoding and handling a WebSocket message")
+        self.metrics.describe("lock_wait_seconds", "Time the WebSocket thread waited for the game state writer lock")
+        self.metrics.describe("upload_seconds", "Album art upload latency")
+        self.metrics.describe("upload_failures_total", "Failed album art uploads")
+        self.metrics.describe("album_art_prewarmed_total", "Songs that started with their album art already uploaded")
+        self.metrics.describe("album_art_prewarm_uploads", "Covers uploaded ahead of time from the custom song library")
+        self.metrics.describe("image_shrink_seconds", "Time spent shrinking album art before the upload")
+        self.metrics.describe("presence_update_seconds", "Discord presence update latency")
+        self.metrics.describe("discord_reconnects_total", "Lost connections to Discord")
+        self.metrics.describe("websocket_reconnects", "Reconnects to the SynthRiders WebSocket")
+        self.metrics.describe("process_scan_seconds", "Time spent looking for the Synth Riders process")
+        self.metrics.gauge("websocket_reconnects", self.websocket_reconnect_count)
+        self.metrics.gauge("events_coalesced", lambda: self.events.coalesced)
+        self.metrics.gauge("events_dropped", lambda: self.events.dropped)
+        if self.art_warmer is not None:
+            self.metrics.gauge("album_art_prewarm_uploads", lambda: self.art_warmer.uploaded)
+
+    def start_profiling(self) -> None:
+        """
+        Profile the RPC if enabled by the SYNTHRIDERS_RPC_PROFILE and SYNTHRIDERS_RPC_TRACEMALLOC
+        environment variables, or the profile_mode and tracemalloc_interval config options
         """
+        mode = os.environ.get("SYNTHRIDERS_RPC_PROFILE") or self.config.get("profile_mode")
+        tracemalloc_interval = os.environ.get("SYNTHRIDERS_RPC_TRACEMALLOC") or self.config.get(
+            "tracemalloc_interval"
+        )
+        if not mode and not tracemalloc_interval or self.profiler is not None:
+            return
+
         try:
-            self.logger.clear()
-            self.connect_discord()
-            self.start_websocket()
+            self.profiler = Profiler(
+                join(self.install_folder, "logs"),
+                self.logger,
+                mode or None,
+                float(tracemalloc_interval) if tracemalloc_interval else None,
+                Config.PROFILE_SAMPLE_INTERVAL,
+            )
+        except ValueError as e:
+            self.logger.error(f"Profiling disabled: {e}")
+            return
+        self.profiler.start()
 
-            self.start_time = int(time.time())
-            self.rpc_loop()
+    def start_library_scan(self) -> None:
+        """
+        Update the custom song library index in the background
+        """
+        if self.library is None:
+            return
+        threading.Thread(target=self.scan_library, name="LibraryScan", daemon=True).start()
+
+    def scan_library(self) -> None:
+        started = perf_counter()
+        try:
+            read, removed = self.library.scan()
         except Exception as e:
-            self.logger.error(f"An error occurred: {e}")
+            self.logger.error(f"Could not scan the custom song library: {e}")
+            return
+        self.logger.info(
+            f"Indexed {len(self.library.songs_by_key)} custom songs in {perf_counter() - started:.1f}s "
+            f"({read} read, {removed} removed)"
+        )
+        if self.art_warmer is not None:
+            self.art_warmer.start()
+
+    def find_library_song(self, event_data: dict) -> dict | None:
+        """
+        Look up the song of a SongStart event in the custom song library
+
+        :param event_data: The event data
+        :return: The song metadata, or None if it is not in the library
+        """
+        if self.library is None:
+            return None
+        return self.library.find(
+            event_data.get("song", ""), event_data.get("author", ""), event_data.get("beatMapper", "")
+        )
+
+    def is_idle(self) -> bool:
+        """
+        Check whether the game is running but no song is played, so background uploads don't
+        compete with the album art of a starting song
+
+        :return: True if the game is idle in the menus
+        """
+        return self.lifecycle == Lifecycle.IN_GAME and self.state.song is None
+
+    def start_metrics_server(self) -> None:
+        """
+        Serve the metrics on localhost, if a metrics port is configured
+        """
+        port = self.config.get("metrics_port")
+        if not port or self.metrics_server is not None:
+            return
+
+        try:
+            self.metrics_server = MetricsServer(self.metrics, int(port))
+        except OSError as e:
+            self.logger.error(f"Could not serve metrics on port {port}: {e}")
+            return
+        self.metrics_server.start()
+        self.logger.info(f"Serving metrics on {self.metrics_server.url}")
+
+    def wait_for_discord(self) -> Lifecycle:
+        """
+        Connect to Discord, the connection is reused across game sessions
+        """
+        self.connect_discord()
+        # A new connection starts without an activity, so the next update is never skipped
+        self.publisher.reset()
+        return Lifecycle.WAITING_FOR_GAME
+
+    def wait_for_game(self) -> Lifecycle | None:
+        """
+        Wait for Synth Riders to run, or stop if it is not running and the RPC should not keep running
+        """
+        if not self.synth_riders_process_exists():
+            if not self.config.get("keep_running_preference"):
+                self.logger.info("Synth Riders is not running")
+                return None
+
+            self.logger.info("Waiting for Synth Riders...")
+            self.game_process.track(self.game_launch.wait())
+
+        return Lifecycle.IN_GAME
+
+    def run_game_session(self) -> Lifecycle:
+        """
+        Publish the presence while Synth Riders is running
+        """
+        if not self.start_time:
+            self.start_time = int(time.time())
+        self.start_recording()
+        self.start_tracing()
+        self.start_websocket()
+        self.rpc_loop()
+        return Lifecycle.GAME_EXITED
 
     def connect_discord(self):
         while True:
@@ -70,189 +419,676 @@ class Presence:
                 self.logger.info("Waiting for Discord...")
                 sleep(15)
 
+    def start_recording(self) -> None:
+        """
+        Start recording the WebSocket frames of this game session, if enabled
+        """
+        if not self.config.get("record_sessions") or self.recorder is not None:
+            return
+
+        sessions_folder = join(self.install_folder, "sessions")
+        makedirs(sessions_folder, exist_ok=True)
+        session_file_path = join(
+            sessions_folder, f"session-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz"
+        )
+        self.recorder = SessionRecorder(session_file_path)
+        self.logger.info(f"Recording session to {session_file_path}")
+
+    def stop_recording(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def start_tracing(self) -> None:
+        """
+        Start tracing the handling of the events of this game session, if enabled
+        """
+        if not self.config.get("trace_events") or self.tracer is not None:
+            return
+
+        self.tracer = Tracer(Config.TRACE_MAX_EVENTS)
+        self.logger.info("Tracing events")
+
+    def stop_tracing(self) -> None:
+        """
+        Write the trace of this game session to the traces folder
+        """
+        tracer = self.tracer
+        if tracer is None:
+            return
+
+        self.tracer = None
+        self.traced_pending_ids.clear()
+        traces_folder = join(self.install_folder, "traces")
+        makedirs(traces_folder, exist_ok=True)
+        trace_file_path = join(traces_folder, f"trace-{datetime.now():%Y%m%d-%H%M%S}.json")
+        tracer.write(trace_file_path)
+        self.logger.info(f"Wrote trace to {trace_file_path}")
+
+    def trace(self, name: str, *event_ids: int, flow: str = "t", **args):
+        """
+        Trace a block of work, if tracing is enabled
+
+        :param name: The span name
+        :param event_ids: The ids of the events the work is done for
+        :param flow: "s" if the span starts the flow of its events, "f" if it ends it
+        :param args: Extra values shown for the span
+        :return: A context manager around the block
+        """
+        if self.tracer is None:
+            return NO_SPAN
+        return self.tracer.span(name, *event_ids, flow=flow, **args)
+
     def start_websocket(self):
-        def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                self.handle_websocket_event(data)
-            except Exception as e:
-                self.logger.error(f"WebSocket error: {e}")
-
-        def on_open(ws):
-            self.logger.info("Connected to SynthRiders WebSocket")
-            self.connected = True
-
-        def on_close(ws, close_status_code, close_msg):
-            self.logger.info("WebSocket connection closed")
-            self.connected = False
-            if self.synth_riders_process_exists():
-                sleep(5)
-                self.start_websocket()
-
-        self.ws = WebSocketApp(self.ws_url,
-                             on_message=on_message,
-                             on_open=on_open,
-                             on_close=on_close)
-
-        ws_thread = threading.Thread(target=self.ws.run_forever)
-        ws_thread.daemon = True
-        ws_thread.start()
-
-    def upload_base64_image(self, upload_url: str, base64_string: str) -> str:
-        # Extract the base64 part from the data URL
-        match = re.match(r'data:image/\w+;base64,(.*)', base64_string)
-        if not match:
+        if self.event_thread is None:
+            self.event_thread = threading.Thread(
+                target=self.process_events, name="EventProcessor", daemon=True
+            )
+            self.event_thread.start()
+        self.websocket.start()
+
+    def on_websocket_open(self):
+        self.logger.info("Connected to SynthRiders WebSocket")
+        self.connected = True
+
+    def on_websocket_close(self):
+        self.logger.info("WebSocket connection closed")
+        self.connected = False
+
+    def handle_websocket_message(self, message: str | bytes) -> None:
+        """
+        Buffer a message received from the SynthRiders WebSocket for processing
+
+        Only the event type is read here, so the receiving thread keeps up however dense the map is
+
+        :param message: The raw JSON message
+        """
+        if self.recorder is not None:
+            self.recorder.record(message)
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+
+        event_type = EventDecoder.sniff_event_type(message)
+        if event_type is not None and event_type not in self.HANDLED_EVENT_TYPES:
+            event_type = "unhandled"
+
+        counter = self.received_counters.get(event_type)
+        if counter is None:
+            counter = self.received_counters[event_type] = self.metrics.counter(
+                "events_received_total", type=str(event_type)
+            )
+        counter.inc()
+        if event_type == "unhandled":
+            return
+
+        tracer = self.tracer
+        event_id = tracer.new_id() if tracer is not None else 0
+        received_at = perf_counter()
+        hit = None
+        if event_type == "NoteHit":
+            # Coalescing keeps only the latest NoteHit, so the values every hit counts with are read now
+            life = EventDecoder.find_number_value(message, '"lifeBarPercent"')
+            hit = (
+                received_at,
+                EventDecoder.find_number_value(message, '"score"') or 0,
+                EventDecoder.find_number_value(message, '"combo"') or 0,
+                1.0 if life is None else life,
+            )
+        self.events.put(event_type, (message, event_id, received_at, hit))
+
+    @staticmethod
+    def merge_buffered_events(waiting: tuple, latest: tuple) -> tuple:
+        """
+        Coalesce two buffered events of the same type, keeping the note hits of both
+
+        Events are buffered with their own note hit, the hits are only collected once they are coalesced
+
+        :param waiting: The event waiting in the buffer
+        :param latest: The event received after it
+        :return: The latest event with the note hits of both
+        """
+        message, event_id, received_at, hit = latest
+        hits = waiting[3]
+        if hits is None or hit is None:
+            return latest
+        if not isinstance(hits, NoteHits):
+            first = hits
+            hits = NoteHits(Config.ROLLING_STATS_CAPACITY)
+            hits.add(*first)
+        hits.add(*hit)
+        return message, event_id, received_at, hits
+
+    def process_events(self) -> None:
+        """
+        Process buffered events as they arrive, runs on its own thread
+        """
+        while True:
+            self.events.ready.wait()
+            self.process_buffered_events()
+
+    def process_buffered_events(self) -> None:
+        """
+        Process the events buffered so far, unless the buffer is cleared in the meantime
+        """
+        generation, entries = self.events.drain()
+        for event_type, (message, event_id, received_at, hits) in entries:
+            if self.events.generation != generation:
+                return
+            self.process_websocket_message(event_type, message, event_id, received_at, hits)
+
+    def process_websocket_message(
+        self,
+        event_type: str | None,
+        message: str,
+        event_id: int = 0,
+        received_at: float = 0,
+        hits: NoteHits | tuple | None = None,
+    ) -> None:
+        """
+        Decode and handle a buffered message
+
+        :param event_type: The sniffed event type
+        :param message: The raw JSON message
+        :param event_id: The id of the event while tracing
+        :param received_at: When the message was received, to trace its time in the buffer
+        :param hits: The note hits coalesced into a NoteHit event, or the note hit of the event itself
+        """
+        started = perf_counter()
+        self.traced_event_id = event_id
+        tracer = self.tracer
+        if tracer is not None and event_id:
+            tracer.add("buffered", received_at, started, (event_id,), "s", {"type": event_type})
+
+        try:
+            with self.trace("decode", event_id, size=len(message)):
+                data = self.decoder.decode(message)
+            if data is not None:
+                with self.trace("handle_websocket_event", event_id, type=event_type):
+                    self.handle_websocket_event(data, received_at, hits)
+        except Exception as e:
+            self.logger.error(f"WebSocket error: {e}")
+
+        histogram = self.handling_histograms.get(event_type)
+        if histogram is None:
+            histogram = self.handling_histograms[event_type] = self.metrics.histogram(
+                "event_handling_seconds", type=str(event_type)
+            )
+        histogram.observe(perf_counter() - started)
+
+    def upload_base64_image(self, upload_url: str, base64_string: str | LazyField) -> str:
+        image_data, image_type = self.decode_base64_image(base64_string)
+
+        # Replaying a song reuses the URL of the previous upload
+        key = self.upload_cache.key(image_data)
+        url = self.upload_cache.get(key)
+        if url is not None:
+            self.logger.info(f"Using cached album art: {url}")
+            return url
+
+        return self.upload_cache.get_or_upload(
+            key, lambda: self.upload_image_data(upload_url, *self.shrink_image(image_data, image_type))
+        )
+
+    def prewarm_image_data(self, image_data: bytes, image_type: str) -> str:
+        """
+        Shrink and upload a cover for the art warmer, called from the warmer thread
+
+        :param image_data: The decoded image bytes
+        :param image_type: The image type
+        :return: The URL of the uploaded image
+        """
+        return self.upload_image_data(
+            self.config.get("image_upload_url"), *self.shrink_image(image_data, image_type)
+        )
+
+    def shrink_image(self, image_data: bytes, image_type: str) -> tuple[bytes, str]:
+        """
+        Shrink album art before uploading it, falling back to the original image
+
+        :param image_data: The decoded image bytes
+        :param image_type: The image type
+        :return: The image to upload and its type
+        """
+        try:
+            with self.metrics.time("image_shrink_seconds"):
+                shrunk = self.shrinker.shrink(image_data, image_type)
+        except Exception as e:
+            self.logger.warning(f"Could not shrink album art, uploading it as it is: {e}")
+            return image_data, image_type
+
+        self.log_shrunk_image(image_data, shrunk[0])
+        return shrunk
+
+    def log_shrunk_image(self, image_data: bytes, shrunk_data: bytes) -> None:
+        if len(shrunk_data) < len(image_data):
+            self.logger.info(
+                f"Shrunk album art from {len(image_data) // 1024} KB to {len(shrunk_data) // 1024} KB"
+            )
+
+    def decode_base64_image(self, base64_string: str | LazyField) -> tuple[bytes, str]:
+        """
+        Decode a base64 data URL without copying the payload through a regex
+
+        :param base64_string: The image as a "data:image/<type>;base64,..." URL
+        :return: The decoded image bytes and the image type
+        """
+        if isinstance(base64_string, LazyField):
+            base64_string = base64_string.value
+
+        # Only the short header is inspected as a string
+        header_end = base64_string.find(",", 0, 64)
+        header = base64_string[:header_end]
+        if (
+            header_end == -1
+            or not header.startswith("data:image/")
+            or not header.endswith(";base64")
+        ):
             self.logger.error("Invalid base64 image format")
             raise ValueError("Invalid base64 image format")
 
-        image_data = base64.b64decode(match.group(1))
+        image_type = header[len("data:image/") : -len(";base64")]
 
-        # Create a temporary file to store the image
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-            temp_file.write(image_data)
-            temp_file_path = temp_file.name
+        try:
+            # a2b_base64 reads an ASCII str in place, so the payload is only sliced off once
+            return binascii.a2b_base64(base64_string[header_end + 1 :]), image_type
+        except binascii.Error as e:
+            self.logger.error("Invalid base64 image format")
+            raise ValueError("Invalid base64 image format") from e
 
-        # Upload
-        with open(temp_file_path, "rb") as image_file:
-            response = requests.post(upload_url, files={"files[]": image_file})
-            self.logger.info(f"Upload response: {response.text}")
+    def upload_image_data(
+        self, upload_url: str, image_data: bytes, image_type: str = "png"
+    ) -> str:
+        """
+        Upload an image to the file hosting from memory, reusing the pooled connection
 
-        # Remove the temporary file after upload
-        try:
-            os.remove(temp_file_path)
-        except OSError:
-            self.logger.error("Failed to remove temporary file")
-            pass
+        :param upload_url: The pomf-compatible upload URL
+        :param image_data: The decoded image bytes
+        :param image_type: The image type, used for the file name and content type
+        :return: The URL of the uploaded image
+        """
+        with self.metrics.time("upload_seconds"):
+            try:
+                return self.post_image_data(upload_url, image_data, image_type)
+            except Exception:
+                self.metrics.inc("upload_failures_total")
+                raise
+
+    def post_image_data(self, upload_url: str, image_data: bytes, image_type: str) -> str:
+        response = self.session.post(
+            upload_url,
+            files={
+                "files[]": (
+                    f"cover.{image_type}",
+                    BytesIO(image_data),
+                    f"image/{image_type}",
+                )
+            },
+            timeout=(Config.IMAGE_UPLOAD_CONNECT_TIMEOUT, Config.IMAGE_UPLOAD_READ_TIMEOUT),
+        )
+        self.logger.info(f"Upload response: {response.text}")
 
         # Parse and return the URL from response
         if response.status_code == 200:
             try:
-                self.logger.info(f"Upload response: {response.json()}")
                 return response.json()["files"][0]["url"]
-            except (KeyError, IndexError):
+            except (KeyError, IndexError, ValueError):
                 self.logger.error(f"Unexpected response format: {response.text}")
                 raise ValueError("Unexpected response format")
         else:
             self.logger.error(f"Unexpected response format: {response.text}")
             raise ValueError(f"Upload failed with status code {response.status_code}: {response.text}")
 
+    def handle_websocket_event(
+        self, data, received_at: float = 0, hits: NoteHits | tuple | None = None
+    ):
+        """
+        Update the game state with a decoded event
 
-    def handle_websocket_event(self, data):
+        :param data: The decoded event
+        :param received_at: When the event was received, the time of the handling if unknown
+        :param hits: The note hits coalesced into a NoteHit event, only the event itself if not coalesced
+        """
         event_type = data.get("eventType")
         event_data = data.get("data", {})
+        album_art = None
+        finished = None
+        library_song = None
+        album_url = None
+        if event_type == "SongStart":
+            library_song = self.find_library_song(event_data)
+            album_url = self.find_prewarmed_album_url(library_song)
 
-        with self.lock:
+        tracer = self.tracer
+        telemetry = self.telemetry
+        event_id = self.traced_event_id
+        waiting_since = perf_counter()
+        received_at = received_at or waiting_since
+        # Only the upload callback and resets write the state concurrently, readers never lock
+        with self.state_lock:
+            locked_at = perf_counter()
+            self.lock_wait.observe(locked_at - waiting_since)
+            state = self.state
             if event_type == "SongStart":
-                self.current_song = {
-                    "title": event_data.get("song", "Unknown Song"),
-                    "artist": event_data.get("author", "Unknown Artist"),
-                    "difficulty": event_data.get("difficulty", "Unknown"),
-                    "mapper": event_data.get("beatMapper", "Unknown Mapper"),
-                    "length": event_data.get("length", 0),
-                    "albumArt": event_data.get("albumArt", None)
-                }
-                self.song_length = self.current_song["length"]
-                self.song_progress = 0
-                self.score = 0
-                self.combo = 0
-                self.life = 1.0
-
-                self.logger.info(f"Current song data: {self.current_song}")
-
-                # upload albumArt
-                self.current_song["albumUrl"] = self.upload_base64_image(self.config.get("image_upload_url"), event_data.get("albumArt")) or None
-
+                song_id = state.song_id + 1
+                song = SongState.from_event(song_id, event_data, library_song, time.time())
+                if album_url is not None:
+                    song = song.with_album_url(album_url)
+                else:
+                    # The album art is only referenced until it is handed to the uploader
+                    album_art = event_data.get("albumArt")
+                self.state = GameState(song, PlayState(), song_id)
+                self.rolling_stats.start(received_at)
+                if telemetry is not None:
+                    telemetry.start(song.title, received_at)
 
             elif event_type == "SongEnd" or event_type == "ReturnToMenu":
-                self.current_song = None
-                self.song_progress = 0
+                finished = state
+                self.state = GameState(None, state.play.with_progress(0), state.song_id)
 
             elif event_type == "PlayTime":
-                self.song_progress = event_data.get("playTimeMS", 0) / 1000
+                # Lets the rates fall during breaks in the song, when no notes are hit
+                self.state = state.with_play(
+                    state.play.with_progress(event_data.get("playTimeMS", 0) / 1000).with_rates(
+                        self.rolling_stats.advance(received_at)
+                    )
+                )
 
             elif event_type == "NoteHit":
-                self.score = event_data.get("score", 0)
-                self.combo = event_data.get("combo", 0)
-                self.life = event_data.get("lifeBarPercent", 1.0)
+                score = event_data.get("score", 0)
+                combo = event_data.get("combo", 0)
+                life = event_data.get("lifeBarPercent", 1.0)
+                if isinstance(hits, NoteHits):
+                    # Every coalesced hit counts for the rates and the peak combo
+                    for hit_at, hit_score, hit_combo, hit_life in hits.hits:
+                        rates = self.rolling_stats.add(hit_at, hit_score)
+                        if telemetry is not None:
+                            telemetry.capture(hit_score, hit_combo, hit_life, hit_at)
+                    peak_combo = hits.peak_combo
+                else:
+                    rates = self.rolling_stats.add(received_at, score)
+                    if telemetry is not None:
+                        telemetry.capture(score, combo, life, received_at)
+                    peak_combo = combo
+                self.state = state.with_play(
+                    state.play.with_note_hit(score, combo, life, rates, peak_combo)
+                )
 
             elif event_type == "SceneChange":
                 if event_data.get("sceneName") == "3.GameEnd":
-                    self.current_song = None
+                    finished = state
+                    self.state = state.with_song(None)
+
+        if finished is not None and finished.song is not None:
+            self.record_play(finished, event_type == "SongEnd")
+            if telemetry is not None:
+                telemetry.finish(event_type == "SongEnd")
+
+        # Score and progress are picked up by the periodic refresh,
+        # only transitions need to show up right away
+        if event_type in ("SongStart", "SongEnd", "ReturnToMenu", "SceneChange"):
+            if tracer is not None:
+                tracer.add("lock_wait", waiting_since, locked_at, (event_id,), "t", {})
+                self.traced_pending_ids.append(event_id)
+            self.publisher.notify()
+
+        if event_type == "SongStart":
+            self.logger.info(f"Current song data: {song}")
+            if library_song is not None and self.art_warmer is not None:
+                self.art_warmer.mark_played(library_song["path"])
+
+            # The presence shows the default logo until the upload has finished
+            if album_art:
+                song_id = song.song_id
+                submitted_at = perf_counter()
+                cover_path = library_song["path"] if library_song is not None else None
+
+                def on_uploaded(url: str) -> None:
+                    if cover_path is not None and self.art_warmer is not None:
+                        # The warmer doesn't need to upload the archive cover of this song again
+                        self.art_warmer.remember(cover_path, url)
+                    self.set_album_url(song_id, url, event_id, submitted_at)
+
+                self.uploader.submit(album_art, on_uploaded)
+
+    def record_play(self, state: GameState, completed: bool) -> None:
+        """
+        Queue a finished song for the play history
+
+        :param state: The game state the song ended in
+        :param completed: Whether the song was played to its end
+        """
+        if self.history is None:
+            return
+        song, play = state.song, state.play
+        ended_at = time.time()
+        self.history.record(Play(
+            song.title,
+            song.artist,
+            song.mapper,
+            song.difficulty,
+            play.score,
+            play.max_combo,
+            play.life,
+            # Without PlayTime events, the time since the start is the best guess
+            play.progress or ended_at - song.started_at,
+            song.started_at,
+            ended_at,
+            completed,
+        ))
 
+    def find_prewarmed_album_url(self, library_song: dict | None) -> str | None:
+        """
+        Get the URL of the cover the album art warmer uploaded for a custom song
+
+        :param library_song: The metadata of the song from the custom song library
+        :return: The URL, or None if the cover is not uploaded
+        """
+        if library_song is None or self.art_warmer is None:
+            return None
+        url = self.art_warmer.find(library_song["path"])
+        if url is not None:
+            self.metrics.inc("album_art_prewarmed_total")
+            self.logger.info(f"Using prewarmed album art: {url}")
+        return url
+
+    def set_album_url(
+        self, song_id: int, url: str, event_id: int = 0, submitted_at: float = 0
+    ) -> None:
+        """
+        Show the uploaded album art, unless its song has already ended
+
+        :param song_id: The id of the song the album art belongs to
+        :param url: The URL of the uploaded album art
+        :param event_id: The id of the traced SongStart event the album art belongs to
+        :param submitted_at: When the upload was submitted, to trace its duration including the queue
+        """
+        tracer = self.tracer
+        if tracer is not None and event_id:
+            tracer.add("upload", submitted_at, perf_counter(), (event_id,), "t", {"url": url})
 
+        with self.state_lock:
+            song = self.state.song
+            if song is None or song.song_id != song_id:
+                self.logger.info(f"Song already ended, dropping album art: {url}")
+                return
 
+            self.state = self.state.with_song(song.with_album_url(url))
+            if tracer is not None and event_id:
+                self.traced_pending_ids.append(event_id)
+
+        self.publisher.notify()
 
     def rpc_loop(self):
         """
-        Loop to keep the RPC running
+        Publish the presence whenever the game state changes, until Synth Riders exits
         """
-        while True:
-            if not self.synth_riders_process_exists():
-                self.handle_game_exit()
-                break
+        while self.synth_riders_process_exists():
+            self.publisher.run_until(time.monotonic() + Config.PROCESS_CHECK_INTERVAL)
 
-            self.update_presence()
-            sleep(15)
+    def render_presence(self) -> dict:
+        """
+        Render the presence for the current game state
 
-    def update_presence(self):
+        :return: The keyword arguments for the presence update
+        """
         buttons = [{
             "label": "Want this status too?",
             "url": "https://github.com/6uhrmittag/Synth-Riders-DiscordRPC"
         }] if self.config.get("promote_preference") else None
 
-        with self.lock:
-            if self.current_song:
-                time_str = self.format_time(self.song_progress)
-                length_str = self.format_time(self.song_length)
-
-                details = f"{self.current_song['title']} by {self.current_song['artist']}"
-                state = (f"{self.current_song['difficulty']} | "
-                        f"{time_str}/{length_str} | "
-                        f"Score: {self.score:,} | "
-                        f"Combo: {self.combo}x")
-
-                self.presence.update(
-                    details=details,
-                    state=state,
-                    large_image=self.current_song['albumUrl'] or self.config.get("discord_application_logo_large"),
-                    #large_text=f"Playing Synth Riders VR",
-                    large_text=f"Mapped by {self.current_song['mapper']}",
-                    small_image=self.config.get("discord_application_logo_small"),
-                    small_text=f"Mapped by {self.current_song['mapper']}",
-                    # small_text=f"Life: {self.life*100:.0f}%",
-                    buttons=buttons,
-                    start=self.start_time
-                )
-            else:
-                self.presence.update(
-                    details=None,
-                    state="Browsing menus",
-                    large_image=self.config.get("discord_application_logo_large"),
-                    buttons=buttons,
-                    start=self.start_time
-                )
+        # One snapshot, so the song and its progress always belong together
+        snapshot = self.state
+        song = snapshot.song
+        play = snapshot.play
+
+        if song:
+            details = f"{song.title} by {song.artist}"
+            fields = self.template_fields(song, play)
+            state = self.render_template("state_template", Config.PRESENCE_STATE_TEMPLATE, fields)
+            small_text = self.render_template(
+                "small_text_template", Config.PRESENCE_SMALL_TEXT_TEMPLATE, fields
+            )
+
+            return dict(
+                details=details,
+                state=state,
+                large_image=song.album_url or self.config.get("discord_application_logo_large"),
+                #large_text=f"Playing Synth Riders VR",
+                large_text=f"Mapped by {song.mapper}" + (f" | {song.bpm:g} BPM" if song.bpm else ""),
+                small_image=self.config.get("discord_application_logo_small"),
+                small_text=small_text,
+                buttons=buttons,
+                start=self.start_time
+            )
+        else:
+            return dict(
+                details=None,
+                state="Browsing menus",
+                large_image=self.config.get("discord_application_logo_large"),
+                buttons=buttons,
+                start=self.start_time
+            )
+
+    def template_fields(self, song: SongState, play: PlayState) -> dict:
+        """
+        Get the values the state and small text templates can show
+
+        :param song: The song being played
+        :param play: The progress of the song
+        :return: The template fields by name
+        """
+        return {
+            "title": song.title,
+            "artist": song.artist,
+            "mapper": song.mapper,
+            "difficulty": song.difficulty,
+            "bpm": song.bpm or 0,
+            "time": self.format_time(play.progress),
+            "length": self.format_time(song.length),
+            "score": play.score,
+            "combo": play.combo,
+            "max_combo": play.max_combo,
+            "life": play.life * 100,
+            "notes_per_second": play.notes_per_second,
+            "score_per_second": play.score_per_second,
+        }
+
+    def load_template(self, key: str, default: str) -> str:
+        """
+        Get a presence template from the config, falling back to the default if it can't be rendered
+
+        :param key: The config key of the template
+        :param default: The default template
+        :return: The template
+        """
+        template = self.config.get(key) or default
+        try:
+            template.format_map(self.template_fields(SongState(0, "", "", "", "", 0), PlayState()))
+        except Exception as e:
+            self.logger.error(f"Invalid {key} {template!r}, using the default: {e!r}")
+            return default
+        return template
+
+    def render_template(self, name: str, default: str, fields: dict) -> str:
+        """
+        Render a presence template, switching to the default for good if it fails
+
+        The test render at startup only sees placeholder values, so a template can still fail
+        on the values of a real song, e.g. a format spec that doesn't fit a float BPM
+
+        :param name: The attribute holding the template
+        :param default: The default template
+        :param fields: The template fields, see `template_fields`
+        :return: The rendered text, clipped to the length Discord accepts
+        """
+        template = getattr(self, name)
+        try:
+            text = template.format_map(fields)
+        except Exception as e:
+            self.logger.error(f"Could not render {template!r}, using the default: {e!r}")
+            setattr(self, name, default)
+            text = default.format_map(fields)
+        return text[:Config.PRESENCE_TEXT_MAX_LENGTH]
+
+    def update_presence(self, payload: dict):
+        """
+        Send a rendered presence to Discord
+
+        :param payload: The keyword arguments for the presence update
+        """
+        with self.metrics.time("presence_update_seconds"), self.trace(
+            "update_presence", *self.take_traced_pending_ids(), flow="f"
+        ):
+            self.presence.update(**payload)
+
+    def take_traced_pending_ids(self) -> list[int]:
+        """
+        Take the ids of the traced events the next Discord update publishes
+
+        :return: The event ids
+        """
+        event_ids = {}
+        while self.traced_pending_ids:
+            event_ids[self.traced_pending_ids.popleft()] = None
+        return list(event_ids)
 
     def format_time(self, seconds):
         return time.strftime("%M:%S", time.gmtime(seconds))
 
-    def handle_game_exit(self):
+    def handle_game_exit(self) -> Lifecycle | None:
+        """
+        Clean up after Synth Riders exited, so the next game session starts from scratch
+        """
         self.logger.info("Synth Riders closed")
+        self.websocket.stop()
+        self.events.clear()
+        self.stop_recording()
+        self.stop_tracing()
+        self.reset_game_state()
+        self.start_time = 0
         self.presence.clear()
+        self.publisher.reset()
+
         if self.config.get("keep_running_preference"):
-            while not self.synth_riders_process_exists():
-                sleep(5)
-            self.start()
+            return Lifecycle.WAITING_FOR_GAME
+        return None
+
+    def reset_game_state(self) -> None:
+        """
+        Forget the current song, uploads that are still running for it are dropped
+        """
+        with self.state_lock:
+            state = self.state
+            self.state = GameState(song_id=state.song_id + 1)
+        if state.song is not None:
+            # The game was closed while a song was played
+            self.record_play(state, False)
 
     def synth_riders_process_exists(self):
         """
-        Check whether the Wuthering Waves process is running
+        Check whether the Synth Riders process is running
 
         :return: True if the process is running, False otherwise
         """
-        for pid in pids():
-            try:
-                if Process(pid).name() == Config.SYNTH_RIDERS_PROCESS_NAME:
-                    return True
-            except NoSuchProcess:
-                pass
-        return False
\ No newline at end of file
+        with self.metrics.time("process_scan_seconds", kind="tracked"):
+            return self.game_process.is_running()
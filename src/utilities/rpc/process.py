@@ -0,0 +1,255 @@
+import sys
+import threading
+from os import listdir
+from time import monotonic, sleep
+
+from psutil import Error as PsutilError, Process, pids, process_iter
+
+from src.utilities.rpc.metrics import Metrics
+
+# wbemErrTimedOut, raised by NextEvent when no event arrived within the timeout
+WBEM_E_TIMED_OUT = -2147209215
+
+
+class ProcessWatcher:
+    """
+    Checks whether a process is running
+
+    The process is looked up by name once and then tracked by its PID and creation time,
+    so only a restart of the process needs another scan of all processes
+    """
+
+    process_name: str
+    process: Process | None
+
+    def __init__(self, process_name: str) -> None:
+        """
+        Create a new process watcher
+
+        :param process_name: The executable name of the process to watch
+        """
+        self.process_name = process_name
+        self.process = None
+        self.lock = threading.Lock()
+
+    def is_running(self) -> bool:
+        """
+        Check whether the process is running
+
+        :return: True if the process is running, False otherwise
+        """
+        with self.lock:
+            if self.process is not None:
+                try:
+                    # psutil compares the creation time, so a reused PID is not mistaken for the process
+                    if self.process.is_running():
+                        return True
+                except PsutilError:
+                    pass
+
+            self.process = self.find()
+            return self.process is not None
+
+    def track(self, pid: int) -> None:
+        """
+        Track a process that was found elsewhere, e.g. by the launch detector
+
+        :param pid: The PID of the process
+        """
+        with self.lock:
+            try:
+                self.process = Process(pid)
+            except PsutilError:
+                self.process = None
+
+    def find(self) -> Process | None:
+        """
+        Scan all processes for the watched process
+
+        :return: The process, or None if it is not running
+        """
+        for process in process_iter(["name"]):
+            if process.info["name"] == self.process_name:
+                return process
+        return None
+
+
+class LaunchDetector:
+    """
+    Waits for a process to start
+
+    Every PID that has been checked once is remembered, so each poll only resolves the names
+    of processes that appeared since the previous poll. On Windows, WMI process creation
+    events are used when available, with polling as the fallback
+    """
+
+    process_name: str
+    poll_interval: float
+    seen_pids: set[int]
+    recent_pids: set[int]
+
+    def __init__(
+        self,
+        process_name: str,
+        poll_interval: float,
+        full_scan_interval: float,
+        metrics: Metrics | None = None,
+    ) -> None:
+        """
+        Create a new launch detector
+
+        :param process_name: The executable name of the process to wait for
+        :param poll_interval: The maximum number of seconds until a launch is detected
+        :param full_scan_interval: Seconds after which every process is checked again,
+            so a PID reused between two polls is not missed forever
+        :param metrics: Records how long each poll takes
+        """
+        self.process_name = process_name
+        self.metrics = metrics
+        self.poll_interval = poll_interval
+        self.full_scan_interval = full_scan_interval
+        self.seen_pids = set()
+        self.recent_pids = set()
+        self.last_full_scan = 0.0
+        # /proc/<pid>/comm is truncated to 15 characters
+        self.comm_name = process_name[:15]
+
+    def wait(self) -> int:
+        """
+        Block until the process is running
+
+        :return: The PID of the process
+        """
+        pid = self.poll()
+        if pid is not None:
+            return pid
+
+        events = self.watch_events()
+        while True:
+            if events is not None:
+                try:
+                    pid = self.wait_for_event(events)
+                except Exception:
+                    # A broken watcher would fail right away on every call, so poll instead
+                    events = None
+                    continue
+                if pid is not None:
+                    return pid
+            else:
+                sleep(self.poll_interval)
+
+            pid = self.poll()
+            if pid is not None:
+                return pid
+
+    def poll(self) -> int | None:
+        """
+        Check the processes that appeared since the last poll
+
+        :return: The PID of the process, or None if it is not running
+        """
+        if self.metrics is None:
+            return self.scan()
+        with self.metrics.time("process_scan_seconds", kind="launch"):
+            return self.scan()
+
+    def scan(self) -> int | None:
+        if monotonic() - self.last_full_scan >= self.full_scan_interval:
+            self.seen_pids = set()
+            self.last_full_scan = monotonic()
+
+        current_pids = self.list_pids()
+        new_pids = current_pids - self.seen_pids
+        # A process caught between fork and exec still has its parent's name,
+        # so new processes are checked once more on the next poll
+        recheck_pids = self.recent_pids & current_pids
+        self.seen_pids = current_pids
+        self.recent_pids = new_pids
+
+        for pid in new_pids | recheck_pids:
+            if self.is_watched_process(pid):
+                return pid
+        return None
+
+    def list_pids(self) -> set[int]:
+        """
+        List the PIDs of all running processes
+
+        :return: The set of PIDs
+        """
+        if sys.platform == "linux":
+            return {int(entry) for entry in listdir("/proc") if entry.isdigit()}
+        return set(pids())
+
+    def is_watched_process(self, pid: int) -> bool:
+        """
+        Check whether a PID belongs to the watched process
+
+        :param pid: The PID to check
+        :return: True if the PID belongs to the watched process
+        """
+        if sys.platform == "linux":
+            try:
+                with open(f"/proc/{pid}/comm", "r") as f:
+                    return f.read().rstrip("\n") == self.comm_name
+            except OSError:
+                return False
+
+        try:
+            return Process(pid).name() == self.process_name
+        except PsutilError:
+            return False
+
+    def watch_events(self):
+        """
+        Subscribe to process creation events, only supported on Windows
+
+        :return: The WMI event watcher, or None if events are not available
+        """
+        if sys.platform != "win32":
+            return None
+
+        try:
+            import pythoncom
+            import win32com.client
+
+            pythoncom.CoInitialize()
+            return win32com.client.GetObject("winmgmts:").ExecNotificationQuery(
+                "SELECT * FROM __InstanceCreationEvent "
+                f"WITHIN {max(1, int(self.poll_interval))} "
+                "WHERE TargetInstance ISA 'Win32_Process' "
+                f"AND TargetInstance.Name = '{self.process_name}'"
+            )
+        except Exception:
+            return None
+
+    def wait_for_event(self, events) -> int | None:
+        """
+        Wait for the next process creation event
+
+        :param events: The WMI event watcher
+        :return: The PID of the created process, or None if no event arrived in time
+        :raises Exception: If the watcher failed for any other reason
+        """
+        try:
+            event = events.NextEvent(int(self.full_scan_interval * 1000))
+        except Exception as e:
+            if self.is_timeout(e):
+                return None
+            raise
+        return int(event.TargetInstance.ProcessId)
+
+    @staticmethod
+    def is_timeout(error: Exception) -> bool:
+        """
+        Check whether a WMI error means that no event arrived in time
+
+        :param error: The error raised by the event watcher
+        :return: True if the error is a timeout
+        """
+        # The error code is either the HRESULT itself or the scode of the COM exception info
+        codes = {getattr(error, "hresult", None)}
+        excepinfo = getattr(error, "excepinfo", None)
+        if excepinfo and len(excepinfo) > 5:
+            codes.add(excepinfo[5])
+        return WBEM_E_TIMED_OUT in codes
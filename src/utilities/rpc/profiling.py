@@ -0,0 +1,207 @@
+import atexit
+import cProfile
+import signal
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from os import makedirs
+from os.path import basename, join
+from time import perf_counter
+
+from src.utilities.rpc.logger import Logger
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads at a fixed interval
+
+    Unlike cProfile, it sees every thread and its overhead doesn't depend on how many
+    functions are called. The samples are written in the folded format used by flame graph tools
+    """
+
+    def __init__(self, interval: float) -> None:
+        """
+        Create a new sampling profiler
+
+        :param interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, name="SamplingProfiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, folded_file_path: str) -> None:
+        """
+        Write the samples in the folded stack format
+
+        :param folded_file_path: The path of the file to write
+        """
+        with open(folded_file_path, "w", encoding="utf-8") as f:
+            for stack, samples in self.samples.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+class Profiler:
+    """
+    Opt-in profiling of the running RPC
+
+    Runs the RPC under cProfile or the sampling profiler and takes periodic tracemalloc snapshots.
+    Reports are written to the logs folder on exit and whenever the process receives SIGUSR1
+    (SIGBREAK, i.e. Ctrl+Break, on Windows). Nothing is started when profiling is disabled
+    """
+
+    MODES = ("cprofile", "sampling")
+
+    def __init__(
+        self,
+        logs_folder: str,
+        logger: Logger,
+        mode: str | None,
+        tracemalloc_interval: float | None,
+        sample_interval: float,
+    ) -> None:
+        """
+        Create a new profiler
+
+        :param logs_folder: The folder to write the reports to
+        :param logger: The logger to report to
+        :param mode: "cprofile", "sampling" or None to not profile the CPU
+        :param tracemalloc_interval: Seconds between tracemalloc snapshots, or None to not trace allocations
+        :param sample_interval: Seconds between samples of the sampling profiler
+        """
+        if mode is not None and mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode {mode}, expected one of {', '.join(self.MODES)}")
+
+        self.logs_folder = logs_folder
+        self.logger = logger
+        self.mode = mode
+        self.tracemalloc_interval = tracemalloc_interval
+        self.sample_interval = sample_interval
+        self.cprofile = None
+        self.sampler = None
+        self.first_snapshot = None
+        self.last_snapshot = None
+        self.stopped = threading.Event()
+        self.dump_lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start profiling, must be called from the thread that runs the RPC lifecycle
+        """
+        if self.mode == "cprofile":
+            # cProfile only sees the thread it was enabled on
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif self.mode == "sampling":
+            self.sampler = SamplingProfiler(self.sample_interval)
+            self.sampler.start()
+
+        if self.tracemalloc_interval:
+            tracemalloc.start(25)
+            self.first_snapshot = self.last_snapshot = tracemalloc.take_snapshot()
+            threading.Thread(target=self.watch_memory, name="TracemallocSnapshots", daemon=True).start()
+
+        dump_signal = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+        if dump_signal is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(dump_signal, lambda signum, frame: self.dump())
+        atexit.register(self.stop)
+
+        self.logger.info(
+            f"Profiling enabled: cpu={self.mode or 'off'}, "
+            f"tracemalloc={f'every {self.tracemalloc_interval}s' if self.tracemalloc_interval else 'off'}"
+        )
+
+    def stop(self) -> None:
+        """
+        Stop profiling and write the final reports
+        """
+        if self.stopped.is_set():
+            return
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.dump(final=True)
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def watch_memory(self) -> None:
+        while not self.stopped.wait(self.tracemalloc_interval):
+            snapshot = tracemalloc.take_snapshot()
+            top = snapshot.compare_to(self.last_snapshot, "lineno")[:5]
+            self.last_snapshot = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+            self.logger.info(
+                f"Traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB), "
+                f"top growth: " + "; ".join(str(stat) for stat in top)
+            )
+
+    def dump(self, final: bool = False) -> None:
+        """
+        Write the reports collected so far to the logs folder
+
+        :param final: Whether profiling stops after this report
+        """
+        with self.dump_lock:
+            started = perf_counter()
+            makedirs(self.logs_folder, exist_ok=True)
+            prefix = join(self.logs_folder, f"profile-{datetime.now():%Y%m%d-%H%M%S}")
+            written = []
+
+            if self.cprofile is not None:
+                # Dumping the stats disables cProfile, so it is enabled again to keep profiling
+                self.cprofile.dump_stats(f"{prefix}.prof")
+                if not final:
+                    self.cprofile.enable()
+                written.append(f"{prefix}.prof")
+
+            if self.sampler is not None:
+                self.sampler.write(f"{prefix}.folded")
+                written.append(f"{prefix}.folded")
+
+            if tracemalloc.is_tracing() and self.first_snapshot is not None:
+                self.write_allocations(f"{prefix}-allocations.txt")
+                written.append(f"{prefix}-allocations.txt")
+
+            if written:
+                self.logger.info(
+                    f"Wrote profiling reports in {perf_counter() - started:.2f}s: {', '.join(written)}"
+                )
+
+    def write_allocations(self, report_file_path: str) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with open(report_file_path, "w", encoding="utf-8") as f:
+            f.write(f"Traced memory: {current} bytes, peak {peak} bytes\n\n")
+            f.write("Top allocations:\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"{stat}\n")
+            f.write("\nGrowth since profiling started:\n")
+            for stat in snapshot.compare_to(self.first_snapshot, "lineno")[:25]:
+                f.write(f"{stat}\n")
+            f.write("\nLargest allocation by traceback:\n")
+            for stat in snapshot.statistics("traceback")[:1]:
+                f.write("\n".join(stat.traceback.format()) + "\n")
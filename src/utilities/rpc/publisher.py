@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from time import monotonic, sleep
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter, allowing `capacity` actions per `period` seconds
+    """
+
+    def __init__(self, capacity: int, period: float) -> None:
+        """
+        Create a new, full token bucket
+
+        :param capacity: The maximum number of tokens in the bucket
+        :param period: The number of seconds it takes to refill the bucket
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+
+    def acquire(self) -> float:
+        """
+        Take a token from the bucket
+
+        :return: The number of seconds to wait before the token may be used
+        """
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class PresencePublisher:
+    """
+    Publishes the presence when the game state changes instead of on a fixed timer
+
+    Bursts of changes are coalesced into one update, updates are rate limited
+    to what Discord allows, and unchanged payloads are never sent
+    """
+
+    def __init__(
+        self,
+        render: Callable[[], dict],
+        publish: Callable[[dict], None],
+        refresh_interval: float,
+        coalesce_delay: float,
+        rate_limit: int,
+        rate_period: float,
+    ) -> None:
+        """
+        Create a new presence publisher
+
+        :param render: Renders the current presence payload
+        :param publish: Sends a presence payload to Discord
+        :param refresh_interval: Seconds between refreshes when nothing notified a change,
+            this keeps the song progress up to date
+        :param coalesce_delay: Seconds to wait for the rest of a burst of changes
+        :param rate_limit: The number of updates allowed per rate period
+        :param rate_period: The rate limit period in seconds
+        """
+        self.render = render
+        self.publish = publish
+        self.refresh_interval = refresh_interval
+        self.coalesce_delay = coalesce_delay
+        self.bucket = TokenBucket(rate_limit, rate_period)
+        self.changed = threading.Event()
+        self.last_payload = None
+        self.next_refresh = 0.0
+
+    def notify(self) -> None:
+        """
+        Signal that the game state changed and the presence should be updated soon
+        """
+        self.changed.set()
+
+    def reset(self) -> None:
+        """
+        Forget the last published payload, e.g. after the presence was cleared
+        """
+        self.last_payload = None
+        self.next_refresh = 0.0
+
+    def run_until(self, deadline: float) -> None:
+        """
+        Publish presence updates until the deadline has passed
+
+        :param deadline: The `time.monotonic()` timestamp to return at
+        """
+        while True:
+            now = monotonic()
+            if now >= deadline:
+                return
+
+            timeout = min(deadline, self.next_refresh) - now
+            if timeout > 0 and not self.changed.wait(timeout):
+                continue
+
+            if self.changed.is_set():
+                sleep(self.coalesce_delay)
+
+            self.publish_now()
+
+    def publish_now(self) -> None:
+        """
+        Render the presence and publish it if it changed since the last update
+        """
+        self.changed.clear()
+        self.next_refresh = monotonic() + self.refresh_interval
+
+        payload = self.render()
+        if payload == self.last_payload:
+            return
+
+        wait = self.bucket.acquire()
+        if wait > 0:
+            sleep(wait)
+            # The state may have moved on while waiting for the rate limit
+            self.changed.clear()
+            payload = self.render()
+
+        self.publish(payload)
+        self.last_payload = payload
+
+
+class AsyncPresencePublisher(PresencePublisher):
+    """
+    Presence publisher for the asyncio runtime, `publish` must be a coroutine function
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.changed = asyncio.Event()
+
+    async def run_until(self, deadline: float) -> None:
+        """
+        Publish presence updates until the deadline has passed
+
+        :param deadline: The `time.monotonic()` timestamp to return at
+        """
+        while True:
+            now = monotonic()
+            if now >= deadline:
+                return
+
+            timeout = min(deadline, self.next_refresh) - now
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except TimeoutError:
+                    continue
+
+            if self.changed.is_set():
+                await asyncio.sleep(self.coalesce_delay)
+
+            await self.publish_now()
+
+    async def publish_now(self) -> None:
+        """
+        Render the presence and publish it if it changed since the last update
+        """
+        self.changed.clear()
+        self.next_refresh = monotonic() + self.refresh_interval
+
+        payload = self.render()
+        if payload == self.last_payload:
+            return
+
+        wait = self.bucket.acquire()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self.changed.clear()
+            payload = self.render()
+
+        await self.publish(payload)
+        self.last_payload = payload
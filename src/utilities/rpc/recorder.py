@@ -0,0 +1,66 @@
+import gzip
+import threading
+from json import dumps, loads
+from queue import Queue
+from time import monotonic
+
+
+class SessionRecorder:
+    """
+    Records every frame received from the SynthRiders WebSocket with its receive time
+
+    Sessions are written as gzip compressed JSON lines of `[seconds since start, frame]`.
+    Frames are compressed and written on a background thread, so recording doesn't slow
+    down the WebSocket thread
+    """
+
+    session_file_path: str
+
+    def __init__(self, session_file_path: str) -> None:
+        """
+        Start recording a new session
+
+        :param session_file_path: The path of the session file to write
+        """
+        self.session_file_path = session_file_path
+        self.started = monotonic()
+        self.frames = Queue()
+        self.thread = threading.Thread(
+            target=self.write_frames, name="SessionRecorder", daemon=True
+        )
+        self.thread.start()
+
+    def record(self, message: str | bytes) -> None:
+        """
+        Record a received frame
+
+        :param message: The raw frame
+        """
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        self.frames.put((monotonic() - self.started, message))
+
+    def close(self) -> None:
+        """
+        Stop recording and wait for the pending frames to be written
+        """
+        self.frames.put(None)
+        self.thread.join()
+
+    def write_frames(self) -> None:
+        with gzip.open(self.session_file_path, "wt", encoding="utf-8") as f:
+            while (frame := self.frames.get()) is not None:
+                received_at, message = frame
+                f.write(dumps([round(received_at, 4), message]))
+                f.write("\n")
+
+
+def load_session(session_file_path: str) -> list[tuple[float, str]]:
+    """
+    Load the frames of a recorded session
+
+    :param session_file_path: The path of the session file
+    :return: The frames as (seconds since start, frame) tuples
+    """
+    with gzip.open(session_file_path, "rt", encoding="utf-8") as f:
+        return [tuple(loads(line)) for line in f if line.strip()]
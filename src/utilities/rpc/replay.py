@@ -0,0 +1,149 @@
+import asyncio
+from json import dumps
+from time import monotonic, perf_counter
+
+import websockets
+
+
+def synthetic_session(
+    songs: int, song_length: float, notes_per_second: float, album_art: str | None = None
+) -> list[tuple[float, str]]:
+    """
+    Generate a session without a recording, playing songs back to back
+
+    :param songs: The number of songs
+    :param song_length: The length of each song in seconds
+    :param notes_per_second: The number of NoteHit events per second
+    :param album_art: The album art data URL sent with every SongStart
+    :return: The frames as (seconds since start, frame) tuples
+    """
+    frames = []
+    now = 0.0
+    for song in range(songs):
+        frames.append((now, dumps({
+            "eventType": "SongStart",
+            "data": {
+                "song": f"Song {song + 1}",
+                "author": "Benchmark",
+                "difficulty": "Expert",
+                "beatMapper": "Benchmark",
+                "length": song_length,
+                "albumArt": album_art,
+            },
+        })))
+
+        notes = int(song_length * notes_per_second)
+        for note in range(1, notes + 1):
+            at = note / notes_per_second
+            frames.append((now + at, dumps({
+                "eventType": "NoteHit",
+                "data": {"score": note * 100, "combo": note, "lifeBarPercent": 1.0},
+            })))
+            # PlayTime is sent about once per second
+            if int(at) != int(at - 1 / notes_per_second):
+                frames.append((now + at, dumps({
+                    "eventType": "PlayTime",
+                    "data": {"playTimeMS": int(at * 1000)},
+                })))
+
+        now += song_length
+        frames.append((now, dumps({"eventType": "SongEnd", "data": {}})))
+        now += 1
+        frames.append((now, dumps({"eventType": "ReturnToMenu", "data": {}})))
+        now += 2
+    return frames
+
+
+def amplify_note_hits(
+    frames: list[tuple[float, str]], factor: int
+) -> list[tuple[float, str]]:
+    """
+    Repeat every NoteHit frame, spreading the copies evenly until the next frame
+
+    :param frames: The recorded frames
+    :param factor: How many times each NoteHit is sent
+    :return: The amplified frames
+    """
+    if factor <= 1:
+        return frames
+
+    amplified = []
+    for i, (received_at, message) in enumerate(frames):
+        amplified.append((received_at, message))
+        if '"NoteHit"' not in message:
+            continue
+
+        next_received_at = frames[i + 1][0] if i + 1 < len(frames) else received_at
+        step = (next_received_at - received_at) / factor
+        for copy in range(1, factor):
+            amplified.append((received_at + step * copy, message))
+    return amplified
+
+
+class SessionReplayer:
+    """
+    Serves a recorded session as a stand-in for the SynthRiders WebSocket
+
+    Every client that connects gets the whole session, at the recorded pace
+    scaled by `speed`, or as fast as possible when `speed` is 0
+    """
+
+    def __init__(
+        self,
+        frames: list[tuple[float, str]],
+        host: str,
+        port: int,
+        speed: float = 1,
+        loop: bool = False,
+        record_sent: bool = False,
+    ) -> None:
+        """
+        Create a new replayer
+
+        :param frames: The frames to replay
+        :param host: The host to listen on
+        :param port: The port to listen on
+        :param speed: The replay speed, 1 is real time and 0 is as fast as possible
+        :param loop: Whether to start over once the session has been replayed
+        :param record_sent: Whether to keep every sent frame in `sent`, which grows without bound when looping
+        """
+        self.frames = frames
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.loop = loop
+        self.record_sent = record_sent
+        # (perf_counter timestamp, frame) of every frame sent, if recorded
+        self.sent: list[tuple[float, str]] = []
+
+    def run(self) -> None:
+        """
+        Serve the session until interrupted
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        async with websockets.serve(self.replay, self.host, self.port, max_size=None):
+            await asyncio.Future()
+
+    async def replay(self, ws) -> None:
+        """
+        Replay the session to a connected client
+
+        :param ws: The client connection
+        """
+        while True:
+            started = monotonic()
+            for received_at, message in self.frames:
+                if self.speed > 0:
+                    delay = received_at / self.speed - (monotonic() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws.send(message)
+                if self.record_sent:
+                    self.sent.append((perf_counter(), message))
+
+            if not self.loop:
+                # Stay connected like the game does, until the client goes away
+                await ws.wait_closed()
+                break
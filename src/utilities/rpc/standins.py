@@ -0,0 +1,214 @@
+import asyncio
+import os
+import struct
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from os.path import exists, join
+from time import perf_counter
+
+
+def get_discord_ipc_folder() -> str:
+    """
+    Get the folder pypresence looks for the Discord IPC socket in on Linux and macOS
+
+    :return: The folder path
+    """
+    return os.environ.get("XDG_RUNTIME_DIR") or (
+        f"/run/user/{os.getuid()}"
+        if exists(f"/run/user/{os.getuid()}")
+        else tempfile.gettempdir()
+    )
+
+
+class FakeDiscordServer:
+    """
+    Stand-in for the Discord client's IPC socket, so the RPC can run headless
+
+    Speaks the handshake and SET_ACTIVITY framing on a Unix socket and records every activity
+    with the time it was received. Latency, dropped pipes and rate limit errors can be injected.
+    Only Unix sockets are supported, not Windows named pipes
+    """
+
+    OP_HANDSHAKE = 0
+    OP_FRAME = 1
+    OP_CLOSE = 2
+
+    activities: list[tuple[float, dict | None]]
+
+    def __init__(
+        self,
+        ipc_folder: str | None = None,
+        latency: float = 0,
+        drop_after: int | None = None,
+        rate_limit: int | None = None,
+        rate_period: float = 20,
+    ) -> None:
+        """
+        Create a new fake Discord server
+
+        :param ipc_folder: The folder to create the socket in, defaults to where pypresence looks
+        :param latency: Seconds to wait before answering each frame
+        :param drop_after: Close the pipe once after this many activities
+        :param rate_limit: Answer with a rate limit error when more activities than this
+            arrive within `rate_period` seconds
+        :param rate_period: The rate limit period in seconds
+        """
+        self.ipc_path = join(ipc_folder or get_discord_ipc_folder(), "discord-ipc-0")
+        self.latency = latency
+        self.drop_after = drop_after
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        # (perf_counter timestamp, activity), None is a cleared activity
+        self.activities = []
+        self.rate_limited = 0
+        self.dropped = 0
+        self.loop = None
+        self.server = None
+
+    def start(self) -> None:
+        """
+        Start serving on a background thread
+        """
+        started = threading.Event()
+
+        async def serve() -> None:
+            self.server = await asyncio.start_unix_server(self.handle, self.ipc_path)
+            started.set()
+            await self.server.serve_forever()
+
+        def run() -> None:
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(serve())
+            except asyncio.CancelledError:
+                pass
+
+        if exists(self.ipc_path):
+            os.remove(self.ipc_path)
+        threading.Thread(target=run, name="FakeDiscordServer", daemon=True).start()
+        started.wait()
+
+    def stop(self) -> None:
+        """
+        Stop serving and remove the socket
+        """
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+        if exists(self.ipc_path):
+            os.remove(self.ipc_path)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer the frames of one client connection
+
+        :param reader: The connection reader
+        :param writer: The connection writer
+        """
+        try:
+            while True:
+                op, length = struct.unpack("<II", await reader.readexactly(8))
+                payload = loads(await reader.readexactly(length))
+
+                if op == self.OP_CLOSE:
+                    break
+
+                if op == self.OP_HANDSHAKE:
+                    self.send(writer, self.OP_FRAME, {
+                        "cmd": "DISPATCH",
+                        "evt": "READY",
+                        "data": {"v": 1, "user": {"id": "0", "username": "benchmark"}},
+                        "nonce": None,
+                    })
+                    continue
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                if payload.get("cmd") != "SET_ACTIVITY":
+                    self.send(writer, self.OP_FRAME, {
+                        "cmd": payload.get("cmd"), "data": {}, "evt": None, "nonce": payload.get("nonce")
+                    })
+                    continue
+
+                now = perf_counter()
+                if self.is_rate_limited(now):
+                    self.rate_limited += 1
+                    self.send(writer, self.OP_FRAME, {
+                        "cmd": "SET_ACTIVITY",
+                        "evt": "ERROR",
+                        "data": {"code": 5000, "message": "You are being rate limited"},
+                        "nonce": payload.get("nonce"),
+                    })
+                    continue
+
+                activity = payload.get("args", {}).get("activity")
+                self.activities.append((now, activity))
+
+                if self.drop_after is not None and len(self.activities) == self.drop_after:
+                    self.dropped += 1
+                    break
+
+                self.send(writer, self.OP_FRAME, {
+                    "cmd": "SET_ACTIVITY", "data": activity, "evt": None, "nonce": payload.get("nonce")
+                })
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def is_rate_limited(self, now: float) -> bool:
+        if self.rate_limit is None:
+            return False
+        recent = sum(1 for received_at, _ in self.activities if now - received_at < self.rate_period)
+        return recent >= self.rate_limit
+
+    @staticmethod
+    def send(writer: asyncio.StreamWriter, op: int, payload: dict) -> None:
+        data = dumps(payload).encode("utf-8")
+        writer.write(struct.pack("<II", op, len(data)) + data)
+
+
+class FakeUploadServer:
+    """
+    Stand-in for a pomf-compatible file hosting, answering every upload with a fake URL
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Create a new fake upload server
+
+        :param host: The host to listen on
+        :param port: The port to listen on, 0 picks a free port
+        """
+        uploads = self.uploads = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                uploads.append(perf_counter())
+                body = dumps({
+                    "success": True,
+                    "files": [{"url": f"https://example.invalid/{len(uploads)}.png"}],
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.upload_url = f"http://{host}:{self.server.server_port}/upload"
+
+    def start(self) -> None:
+        threading.Thread(
+            target=self.server.serve_forever, name="FakeUploadServer", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
@@ -0,0 +1,114 @@
+from dataclasses import dataclass, replace
+
+
+@dataclass(frozen=True, slots=True)
+class SongState:
+    """
+    The song being played, with only the fields the presence shows
+
+    The album art itself is not kept, it is handed to the uploader when the song starts
+    and only the URL of the upload is stored once it is known
+    """
+
+    song_id: int
+    title: str
+    artist: str
+    difficulty: str
+    mapper: str
+    length: float
+    album_url: str | None = None
+    # Known if the song was found in the custom song library
+    bpm: float | None = None
+    difficulties: tuple[str, ...] = ()
+    started_at: float = 0
+
+    @classmethod
+    def from_event(
+        cls,
+        song_id: int,
+        event_data: dict,
+        library_song: dict | None = None,
+        started_at: float = 0,
+    ) -> "SongState":
+        """
+        Create the song state from the data of a SongStart event
+
+        :param song_id: The id of the song, increasing with every started song
+        :param event_data: The event data
+        :param library_song: The metadata of the song from the custom song library
+        :param started_at: The timestamp the song started at
+        :return: The song state
+        """
+        library_song = library_song or {}
+        return cls(
+            song_id,
+            event_data.get("song", "Unknown Song"),
+            event_data.get("author", "Unknown Artist"),
+            event_data.get("difficulty", "Unknown"),
+            event_data.get("beatMapper", "Unknown Mapper"),
+            event_data.get("length", 0),
+            bpm=library_song.get("bpm"),
+            difficulties=tuple(library_song.get("difficulties") or ()),
+            started_at=started_at,
+        )
+
+    def with_album_url(self, album_url: str) -> "SongState":
+        return replace(self, album_url=album_url)
+
+
+@dataclass(frozen=True, slots=True)
+class PlayState:
+    """
+    The progress of the song being played
+    """
+
+    progress: float = 0
+    score: int = 0
+    combo: int = 0
+    life: float = 1.0
+    max_combo: int = 0
+    # Over the last seconds of the song, see RollingStats
+    notes_per_second: float = 0
+    score_per_second: float = 0
+
+    def with_progress(self, progress: float) -> "PlayState":
+        return PlayState(
+            progress,
+            self.score,
+            self.combo,
+            self.life,
+            self.max_combo,
+            self.notes_per_second,
+            self.score_per_second,
+        )
+
+    def with_note_hit(
+        self, score: int, combo: int, life: float, rates: tuple[float, float], peak_combo: int = 0
+    ) -> "PlayState":
+        # The peak combo covers the hits coalesced into this one
+        max_combo = max(combo, peak_combo, self.max_combo)
+        return PlayState(self.progress, score, combo, life, max_combo, *rates)
+
+    def with_rates(self, rates: tuple[float, float]) -> "PlayState":
+        return PlayState(self.progress, self.score, self.combo, self.life, self.max_combo, *rates)
+
+
+@dataclass(frozen=True, slots=True)
+class GameState:
+    """
+    A snapshot of the game state
+
+    Snapshots are never changed, every update replaces the whole snapshot,
+    so readers can use the current one without locking
+    """
+
+    song: SongState | None = None
+    play: PlayState = PlayState()
+    # Increases with every started song and every reset, so late album art uploads can be dropped
+    song_id: int = 0
+
+    def with_song(self, song: SongState | None) -> "GameState":
+        return GameState(song, self.play, self.song_id)
+
+    def with_play(self, play: PlayState) -> "GameState":
+        return GameState(self.song, play, self.song_id)
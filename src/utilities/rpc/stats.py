@@ -0,0 +1,89 @@
+from array import array
+
+
+class RollingStats:
+    """
+    Notes and score per second over the last seconds of the song being played
+
+    Hits are kept in a fixed size ring buffer, and every hit is added and evicted once,
+    so each event costs O(1) and long or dense songs don't grow the memory.
+    If more hits than fit into the ring arrive within the window, the rates are taken
+    over the shorter time the ring covers
+    """
+
+    def __init__(self, window: float, capacity: int) -> None:
+        """
+        Create new rolling stats
+
+        :param window: The number of seconds the rates are taken over
+        :param capacity: The maximum number of hits kept within the window
+        """
+        self.window = window
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.scores = array("d", bytes(8 * capacity))
+        self.start(0.0)
+
+    def start(self, started: float) -> None:
+        """
+        Start a new song, dropping all hits
+
+        :param started: The perf_counter time the song started at
+        """
+        self.tail = 0
+        self.size = 0
+        self.latest_score = 0
+        # The last hit before the window, the score gained in the window is counted from it
+        self.base_time = started
+        self.base_score = 0
+
+    def add(self, at: float, score: int) -> tuple[float, float]:
+        """
+        Add a note hit
+
+        :param at: The perf_counter time of the hit
+        :param score: The score after the hit
+        :return: The notes per second and the score per second
+        """
+        if self.size == self.capacity:
+            self.evict()
+        head = self.tail + self.size
+        if head >= self.capacity:
+            head -= self.capacity
+        self.times[head] = at
+        self.scores[head] = score
+        self.size += 1
+        self.latest_score = score
+        return self.advance(at)
+
+    def advance(self, at: float) -> tuple[float, float]:
+        """
+        Move the window forward without a hit, e.g. on PlayTime events during a break in the song
+
+        :param at: The current perf_counter time
+        :return: The notes per second and the score per second
+        """
+        cutoff = at - self.window
+        times = self.times
+        if self.size and times[self.tail] < cutoff:
+            tail, size, capacity = self.tail, self.size, self.capacity
+            while size and times[tail] < cutoff:
+                last = tail
+                tail = tail + 1 if tail + 1 < capacity else 0
+                size -= 1
+            self.base_time = times[last]
+            self.base_score = self.scores[last]
+            self.tail, self.size = tail, size
+
+        base_time = self.base_time
+        span = at - (cutoff if cutoff > base_time else base_time)
+        if span <= 0:
+            return 0.0, 0.0
+        return self.size / span, (self.latest_score - self.base_score) / span
+
+    def evict(self) -> None:
+        tail = self.tail
+        self.base_time = self.times[tail]
+        self.base_score = self.scores[tail]
+        self.tail = tail + 1 if tail + 1 < self.capacity else 0
+        self.size -= 1
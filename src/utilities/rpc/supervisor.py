@@ -0,0 +1,164 @@
+import random
+import socket
+import threading
+from time import monotonic
+from typing import Callable
+
+from websocket import WebSocketApp
+
+
+class ReconnectBackoff:
+    """
+    Exponential backoff with jitter between reconnect attempts
+    """
+
+    def __init__(self, initial_delay: float, max_delay: float) -> None:
+        """
+        Create a new backoff
+
+        :param initial_delay: The delay before the first reconnect attempt
+        :param max_delay: The maximum delay between reconnect attempts
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.delay = initial_delay
+
+    def next_delay(self) -> float:
+        """
+        Get the delay before the next reconnect attempt and double it for the one after
+
+        :return: The delay in seconds, randomised between half and all of the current delay
+        """
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.max_delay)
+        return random.uniform(delay / 2, delay)
+
+    def reset(self) -> None:
+        """
+        Start over from the initial delay, e.g. after a stable connection
+        """
+        self.delay = self.initial_delay
+
+
+class WebSocketSupervisor:
+    """
+    Owns the connection to the SynthRiders WebSocket
+
+    At most one connection is open at a time. Lost connections are reopened from the same thread
+    with exponential backoff, instead of starting a new connection from inside the closing one
+    """
+
+    ws: WebSocketApp | None
+    reconnect_count: int
+
+    def __init__(
+        self,
+        url: str,
+        on_message: Callable[[str], None],
+        on_open: Callable[[], None],
+        on_close: Callable[[], None],
+        should_connect: Callable[[], bool],
+        backoff: ReconnectBackoff,
+        stable_after: float,
+    ) -> None:
+        """
+        Create a new supervisor
+
+        :param url: The WebSocket URL
+        :param on_message: Called with every received message
+        :param on_open: Called when a connection opened
+        :param on_close: Called when a connection closed
+        :param should_connect: Whether reconnecting makes sense, e.g. whether the game is running
+        :param backoff: The backoff between reconnect attempts
+        :param stable_after: Seconds after which a connection counts as stable and the backoff is reset
+        """
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_close = on_close
+        self.should_connect = should_connect
+        self.backoff = backoff
+        self.stable_after = stable_after
+        self.ws = None
+        self.thread = None
+        self.opened_at = None
+        self.reconnect_count = 0
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Start the supervisor thread, unless it is already running
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="WebSocketSupervisor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        Close the connection and stop reconnecting
+
+        :param timeout: The number of seconds to wait for the supervisor thread to finish
+        """
+        self.stopped.set()
+        ws = self.ws
+        if ws is not None:
+            self.close_connection(ws)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def run(self) -> None:
+        """
+        Keep a connection open until the supervisor is stopped
+        """
+        while not self.stopped.is_set():
+            self.opened_at = None
+            self.ws = WebSocketApp(
+                self.url,
+                on_message=lambda ws, message: self.on_message(message),
+                on_open=self.handle_open,
+                on_close=self.handle_close,
+            )
+            if self.stopped.is_set():
+                break
+            self.ws.run_forever()
+
+            if self.opened_at is not None and monotonic() - self.opened_at >= self.stable_after:
+                self.backoff.reset()
+
+            # Wait for the backoff, and for as long as there is nothing to connect to
+            self.stopped.wait(self.backoff.next_delay())
+            while not self.stopped.is_set() and not self.should_connect():
+                self.stopped.wait(self.backoff.max_delay)
+
+            if not self.stopped.is_set():
+                self.reconnect_count += 1
+
+    @staticmethod
+    def close_connection(ws: WebSocketApp) -> None:
+        ws.keep_running = False
+        # Shutting the socket down wakes up the receive loop,
+        # closing it from another thread would leave the loop waiting for the peer
+        if ws.sock is not None and ws.sock.sock is not None:
+            try:
+                ws.sock.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle_open(self, ws) -> None:
+        # run_forever() starts over with keep_running set, so a stop() that came in
+        # just before it would be lost without checking again once connected
+        if self.stopped.is_set():
+            self.close_connection(ws)
+            return
+        self.opened_at = monotonic()
+        self.on_open()
+
+    def handle_close(self, ws, close_status_code, close_msg) -> None:
+        # Failed connection attempts are not reported as closed connections
+        if self.opened_at is not None:
+            self.on_close()
@@ -0,0 +1,178 @@
+import threading
+from array import array
+from datetime import datetime
+from os import makedirs
+from os.path import join
+from re import sub
+
+try:
+    # NumPy is optional, without it note telemetry is not captured
+    import numpy
+except ImportError:
+    numpy = None
+
+from src.utilities.rpc.logger import Logger
+
+
+def summarize_notes(times, scores, combos, lives, bin_seconds: float) -> dict:
+    """
+    Summarize the note hits of a song
+
+    :param times: Seconds since the song started, per hit
+    :param scores: The score after each hit
+    :param combos: The combo after each hit
+    :param lives: The life bar after each hit, from 0 to 1
+    :param bin_seconds: The width of the score rate timeline bins
+    :return: The combo breaks, the lowest life, the score rate timeline and the consistency
+    """
+    # A hit with a lower combo than the one before follows a miss
+    breaks = numpy.flatnonzero(numpy.diff(combos) < 0) + 1
+    lowest = int(numpy.argmin(lives))
+
+    bins = (times // bin_seconds).astype(numpy.int64)
+    gained = numpy.diff(scores, prepend=0)
+    score_rate = numpy.bincount(bins, weights=gained, minlength=int(bins[-1]) + 1) / bin_seconds
+
+    # 1 if the score grew at the same rate in every bin with hits, lower the more it varied
+    played = score_rate[numpy.bincount(bins) > 0]
+    mean = played.mean()
+    consistency = (
+        float(numpy.clip(1 - played.std() / mean, 0, 1)) if len(played) > 1 and mean > 0 else 1.0
+    )
+
+    return {
+        "break_times": times[breaks],
+        "break_combos": combos[breaks - 1],
+        "min_life": float(lives[lowest]),
+        "min_life_time": float(times[lowest]),
+        "score_rate": score_rate.astype(numpy.float32),
+        "consistency": consistency,
+    }
+
+
+class NoteTelemetry:
+    """
+    Captures every received NoteHit of a song into preallocated arrays
+
+    Capturing a hit only writes four array slots, so it can stay on during dense maps.
+    When the song ends, the arrays are summarized with NumPy and written as a compressed .npz file
+    on a background thread
+    """
+
+    def __init__(
+        self, telemetry_folder: str, logger: Logger, capacity: int, bin_seconds: float
+    ) -> None:
+        """
+        Create a new note telemetry capture
+
+        :param telemetry_folder: The folder to write the .npz files to
+        :param logger: The logger to report the summaries to
+        :param capacity: The number of hits to preallocate, the buffers grow beyond it
+        :param bin_seconds: The width of the score rate timeline bins
+        """
+        self.telemetry_folder = telemetry_folder
+        self.logger = logger
+        self.bin_seconds = bin_seconds
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.scores = array("q", bytes(8 * capacity))
+        self.combos = array("i", bytes(4 * capacity))
+        self.lives = array("f", bytes(4 * capacity))
+        self.count = 0
+        self.title = None
+        self.started = 0.0
+
+    @staticmethod
+    def available() -> bool:
+        return numpy is not None
+
+    def start(self, title: str, started: float) -> None:
+        """
+        Start capturing a new song, dropping the hits of a song that never ended
+
+        :param title: The song title, used in the file name
+        :param started: The perf_counter time the song started at
+        """
+        self.count = 0
+        self.title = title
+        self.started = started
+
+    def capture(self, score: int, combo: int, life: float, received_at: float) -> None:
+        """
+        Capture a note hit
+
+        :param score: The score after the hit
+        :param combo: The combo after the hit
+        :param life: The life bar after the hit
+        :param received_at: The perf_counter time the hit was received at
+        """
+        if self.title is None:
+            return
+        count = self.count
+        if count == self.capacity:
+            self.grow()
+        try:
+            self.times[count] = received_at - self.started
+            self.scores[count] = score
+            self.combos[count] = combo
+            self.lives[count] = life
+        except (TypeError, OverflowError) as e:
+            self.logger.warning(f"Stopped capturing note telemetry for {self.title}: {e}")
+            self.title = None
+            return
+        self.count = count + 1
+
+    def grow(self) -> None:
+        self.times.extend(array("d", bytes(8 * self.capacity)))
+        self.scores.extend(array("q", bytes(8 * self.capacity)))
+        self.combos.extend(array("i", bytes(4 * self.capacity)))
+        self.lives.extend(array("f", bytes(4 * self.capacity)))
+        self.capacity *= 2
+
+    def finish(self, completed: bool) -> None:
+        """
+        Stop capturing the song and write its telemetry in the background
+
+        :param completed: Whether the song was played to its end
+        """
+        title, count = self.title, self.count
+        self.title = None
+        self.count = 0
+        if title is None or count == 0:
+            return
+
+        # Copied, so the buffers can be reused by the next song right away
+        arrays = (
+            numpy.frombuffer(self.times, numpy.float64, count).copy(),
+            numpy.frombuffer(self.scores, numpy.int64, count).copy(),
+            numpy.frombuffer(self.combos, numpy.int32, count).copy(),
+            numpy.frombuffer(self.lives, numpy.float32, count).copy(),
+        )
+        threading.Thread(
+            target=self.write, args=(title, completed, *arrays), name="NoteTelemetry", daemon=True
+        ).start()
+
+    def write(self, title: str, completed: bool, times, scores, combos, lives) -> None:
+        try:
+            summary = summarize_notes(times, scores, combos, lives, self.bin_seconds)
+            makedirs(self.telemetry_folder, exist_ok=True)
+            file_name = f"notes-{datetime.now():%Y%m%d-%H%M%S}-{sub(r'[^\w-]+', '_', title)[:40]}.npz"
+            telemetry_file_path = join(self.telemetry_folder, file_name)
+            numpy.savez_compressed(
+                telemetry_file_path,
+                times=times.astype(numpy.float32),
+                scores=scores,
+                combos=combos,
+                lives=lives,
+                completed=completed,
+                **summary,
+            )
+        except Exception as e:
+            self.logger.error(f"Could not write the note telemetry of {title}: {e}")
+            return
+
+        self.logger.info(
+            f"Note telemetry of {title}: {len(times)} hits, {len(summary['break_times'])} combo breaks, "
+            f"lowest life {summary['min_life'] * 100:.0f}% at {summary['min_life_time']:.0f}s, "
+            f"consistency {summary['consistency']:.2f}, written to {telemetry_file_path}"
+        )
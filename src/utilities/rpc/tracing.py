@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from itertools import count
+from json import dump
+from time import perf_counter
+from typing import Iterator
+
+# Returned instead of a span when tracing is disabled
+NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Records spans of the work done for each WebSocket event, written as a Chrome trace
+
+    Every received event gets an id, and the spans belonging to it are linked with flow arrows,
+    from the receiving thread through the upload workers to the Discord update.
+    Only the most recent spans are kept, so a long session doesn't grow without bound.
+    The trace file can be opened in chrome://tracing or https://ui.perfetto.dev
+    """
+
+    def __init__(self, max_events: int) -> None:
+        """
+        Create a new tracer
+
+        :param max_events: The maximum number of trace events to keep, older ones are dropped
+        """
+        self.events = deque(maxlen=max_events)
+        self.ids = count(1)
+        self.pid = os.getpid()
+        self.thread_names: dict[int, str] = {}
+
+    def new_id(self) -> int:
+        """
+        Get the id for a newly received event
+
+        :return: The event id
+        """
+        return next(self.ids)
+
+    @contextmanager
+    def span(self, name: str, *event_ids: int, flow: str = "t", **args) -> Iterator[None]:
+        """
+        Record how long the block takes
+
+        :param name: The span name
+        :param event_ids: The ids of the events the work is done for
+        :param flow: "s" if the span starts the flow of its events, "f" if it ends it,
+            "t" for the steps in between
+        :param args: Extra values shown for the span
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, started, perf_counter(), event_ids, flow, args)
+
+    def add(
+        self,
+        name: str,
+        started: float,
+        ended: float,
+        event_ids: tuple[int, ...],
+        flow: str,
+        args: dict,
+    ) -> None:
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self.thread_names:
+            self.thread_names[tid] = thread.name
+
+        ts = started * 1_000_000
+        if event_ids:
+            args["event_ids"] = list(event_ids)
+        self.events.append({
+            "name": name, "ph": "X", "ts": ts, "dur": (ended - started) * 1_000_000,
+            "pid": self.pid, "tid": tid, "args": args,
+        })
+        for event_id in event_ids:
+            flow_event = {
+                "name": "event", "cat": "event", "ph": flow, "id": event_id,
+                "ts": ts, "pid": self.pid, "tid": tid,
+            }
+            if flow == "f":
+                # Bind the end of the arrow to the enclosing span
+                flow_event["bp"] = "e"
+            self.events.append(flow_event)
+
+    def write(self, trace_file_path: str) -> None:
+        """
+        Write the recorded spans as a Chrome trace event file
+
+        :param trace_file_path: The path of the JSON file to write
+        """
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self.thread_names.items())
+        ]
+        with open(trace_file_path, "w", encoding="utf-8") as f:
+            dump({"traceEvents": metadata + list(self.events), "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,79 @@
+import threading
+from queue import Full, Queue
+from typing import Callable
+
+from src.utilities.rpc.logger import Logger
+
+
+class ImageUploader:
+    """
+    Uploads album art on a bounded pool of background threads,
+    so the WebSocket thread never waits on the network
+    """
+
+    logger: Logger
+    jobs: Queue
+
+    def __init__(
+        self,
+        upload: Callable[[str], str],
+        logger: Logger,
+        workers: int = 2,
+        queue_size: int = 4,
+    ) -> None:
+        """
+        Create a new uploader, the worker threads are started with the first job
+
+        :param upload: Uploads a base64 data URL and returns the hosted URL
+        :param logger: The logger to report failed uploads to
+        :param workers: The number of worker threads
+        :param queue_size: The maximum number of jobs waiting for a worker
+        """
+        self.upload = upload
+        self.logger = logger
+        self.workers = workers
+        self.jobs = Queue(maxsize=queue_size)
+        self.started = False
+
+    def submit(self, base64_string: str, on_done: Callable[[str], None]) -> bool:
+        """
+        Queue an image for upload
+
+        :param base64_string: The image as a base64 data URL
+        :param on_done: Called with the hosted URL once the upload succeeded
+        :return: False if the queue is full and the image was not queued
+        """
+        if not self.started:
+            self.start()
+
+        try:
+            self.jobs.put_nowait((base64_string, on_done))
+            return True
+        except Full:
+            self.logger.warning("Upload queue is full, skipping album art")
+            return False
+
+    def start(self) -> None:
+        """
+        Start the worker threads
+        """
+        self.started = True
+        for i in range(self.workers):
+            threading.Thread(
+                target=self.worker, name=f"ImageUploader-{i}", daemon=True
+            ).start()
+
+    def worker(self) -> None:
+        """
+        Take jobs off the queue and upload them
+        """
+        while True:
+            base64_string, on_done = self.jobs.get()
+            try:
+                url = self.upload(base64_string)
+                if url:
+                    on_done(url)
+            except Exception as e:
+                self.logger.error(f"Album art upload failed: {e}")
+            finally:
+                self.jobs.task_done()
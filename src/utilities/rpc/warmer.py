@@ -0,0 +1,220 @@
+import threading
+from collections import OrderedDict
+from json import dump, load
+from os import makedirs, replace
+from os.path import exists, join
+from time import time
+from typing import Callable
+from zipfile import BadZipFile
+
+from src.utilities.rpc.cache import UploadCache
+from src.utilities.rpc.library import SongLibrary, read_cover
+from src.utilities.rpc.logger import Logger
+
+
+class ArtWarmer:
+    """
+    Uploads the covers of custom songs ahead of time, so a SongStart finds its album art already hosted
+
+    Only a warm set of the most recently played songs, followed by the newest downloads, is kept
+    uploaded. One cover is uploaded per interval while the game is idle, and covers are uploaded
+    again shortly before their cached URL expires
+    """
+
+    def __init__(
+        self,
+        library: SongLibrary,
+        cache: UploadCache,
+        upload: Callable[[bytes, str], str],
+        is_idle: Callable[[], bool],
+        logger: Logger,
+        state_folder: str,
+        interval: float,
+        max_songs: int,
+        refresh_margin: float,
+    ) -> None:
+        """
+        Create a new album art warmer and load the recently played songs stored on disk
+
+        :param library: The custom song library to take the covers from
+        :param cache: The upload cache to store the URLs in
+        :param upload: Uploads an image and its type, returning the hosted URL
+        :param is_idle: Whether uploading now doesn't compete with a song being played
+        :param logger: The logger to report to
+        :param state_folder: The folder to store the recently played songs in
+        :param interval: Seconds between uploads
+        :param max_songs: The number of songs to keep uploaded
+        :param refresh_margin: Seconds before the cached URL expires that a cover is uploaded again
+        """
+        makedirs(state_folder, exist_ok=True)
+        self.library = library
+        self.cache = cache
+        self.upload = upload
+        self.is_idle = is_idle
+        self.logger = logger
+        self.played_file_path = join(state_folder, "played.json")
+        self.interval = interval
+        self.max_songs = max_songs
+        self.refresh_margin = refresh_margin
+        # path -> played timestamp, ordered from least to most recently played
+        self.played: OrderedDict[str, float] = OrderedDict()
+        self.played_changed = False
+        # Guards the recently played songs, which are marked by the WebSocket thread
+        self.lock = threading.Lock()
+        self.failed: set[str] = set()
+        self.uploaded = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        self.load()
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="ArtWarmer", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def cover_key(self, path: str) -> str | None:
+        """
+        Get the cache key of the cover of a custom song
+
+        The cover in the archive is not the image the WebSocket sends, so it is keyed by the archive
+        and a changed archive gets a new key
+
+        :param path: The path of the .synth archive
+        :return: The cache key, or None if the song has no cover
+        """
+        entry = self.library.entries.get(path)
+        if entry is None or entry["song"] is None or not entry["song"].get("artwork"):
+            return None
+        return self.cache.key(f"{path}|{entry['mtime']}|{entry['size']}".encode("utf-8"))
+
+    def find(self, path: str) -> str | None:
+        """
+        Get the URL of the uploaded cover of a custom song
+
+        :param path: The path of the .synth archive
+        :return: The URL, or None if the cover is not uploaded
+        """
+        key = self.cover_key(path)
+        return self.cache.get(key) if key is not None else None
+
+    def remember(self, path: str, url: str) -> None:
+        """
+        Store the URL of album art uploaded for a custom song as the URL of its cover
+
+        :param path: The path of the .synth archive
+        :param url: The URL of the uploaded album art
+        """
+        key = self.cover_key(path)
+        if key is not None:
+            self.cache.put(key, url)
+
+    def mark_played(self, path: str) -> None:
+        """
+        Move a song to the front of the warm set
+
+        :param path: The path of the .synth archive
+        """
+        with self.lock:
+            self.played[path] = time()
+            self.played.move_to_end(path)
+            while len(self.played) > self.max_songs:
+                self.played.popitem(last=False)
+            self.played_changed = True
+
+    def warm_set(self) -> list[str]:
+        """
+        Get the songs to keep uploaded, most important first
+
+        :return: The paths of the .synth archives
+        """
+        entries = self.library.entries
+        with self.lock:
+            songs = [path for path in reversed(self.played) if path in entries]
+        played = set(songs)
+        newest = sorted(
+            (path for path in entries if path not in played),
+            key=lambda path: entries[path]["mtime"],
+            reverse=True,
+        )
+        warm_set = []
+        for path in songs + newest:
+            if path not in self.failed and self.cover_key(path) is not None:
+                warm_set.append(path)
+                if len(warm_set) >= self.max_songs:
+                    break
+        return warm_set
+
+    def next_song(self) -> tuple[str, str] | None:
+        """
+        Find the first song of the warm set whose cover is not uploaded or about to expire
+
+        :return: The path of the .synth archive and the cache key of its cover, or None if all are warm
+        """
+        for path in self.warm_set():
+            key = self.cover_key(path)
+            expires_in = self.cache.expires_in(key)
+            if expires_in is None or expires_in < self.refresh_margin:
+                return path, key
+        return None
+
+    def warm_next(self) -> bool:
+        """
+        Upload the next cover of the warm set
+
+        :return: False if all covers are already warm
+        """
+        song = self.next_song()
+        if song is None:
+            return False
+
+        path, key = song
+        try:
+            image_data, image_type = read_cover(path, self.library.entries[path]["song"]["artwork"])
+        except (OSError, KeyError, BadZipFile) as e:
+            # Skipped until the next start, a changed archive is read again by the library scan
+            self.logger.warning(f"Could not read the cover of {path}: {e}")
+            self.failed.add(path)
+            return True
+
+        try:
+            url = self.upload(image_data, image_type)
+        except Exception as e:
+            self.logger.warning(f"Could not upload the cover of {path}, retrying later: {e}")
+            return True
+
+        self.cache.put(key, url)
+        self.uploaded += 1
+        return True
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            if self.played_changed:
+                self.save()
+            if not self.is_idle():
+                continue
+            try:
+                self.warm_next()
+            except Exception as e:
+                self.logger.error(f"Could not warm album art: {e}")
+
+    def load(self) -> None:
+        if not exists(self.played_file_path):
+            return
+        try:
+            with open(self.played_file_path, "r", encoding="utf-8") as f:
+                played = load(f)
+        except (OSError, ValueError):
+            return
+        self.played = OrderedDict(sorted(played.items(), key=lambda item: item[1]))
+
+    def save(self) -> None:
+        with self.lock:
+            played = dict(self.played)
+            self.played_changed = False
+        temporary_path = f"{self.played_file_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            dump(played, f)
+        replace(temporary_path, self.played_file_path)
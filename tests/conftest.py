@@ -0,0 +1,33 @@
+import pytest
+
+from src.utilities.rpc import Presence
+
+
+@pytest.fixture
+def presence_config(tmp_path):
+    return {
+        "rich_presence_install_location": str(tmp_path),
+        "keep_running_preference": False,
+        "promote_preference": False,
+        "discord_application_id": "0",
+        "discord_application_logo_large": "large",
+        "discord_application_logo_small": "small",
+        "synthriders_websocket_host": "127.0.0.1",
+        "synthriders_websocket_port": "9100",
+        "image_upload_url": "http://127.0.0.1:9/upload",
+        "record_play_history": False,
+    }
+
+
+@pytest.fixture
+def make_presence(presence_config):
+    created = []
+
+    def make(**config) -> Presence:
+        presence = Presence({**presence_config, **config})
+        created.append(presence)
+        return presence
+
+    yield make
+    for presence in created:
+        presence.logger.close()
@@ -0,0 +1,18 @@
+import json
+
+
+def song_start(title: str = "Song", **data) -> str:
+    return json.dumps({"eventType": "SongStart", "data": {
+        "song": title, "author": "Artist", "difficulty": "Master", "beatMapper": "Mapper",
+        "length": 120, **data,
+    }})
+
+
+def note_hit(score: int, combo: int, life: float = 1.0) -> str:
+    return json.dumps({"eventType": "NoteHit", "data": {
+        "score": score, "combo": combo, "lifeBarPercent": life,
+    }})
+
+
+def song_end() -> str:
+    return json.dumps({"eventType": "SongEnd", "data": {}})
@@ -0,0 +1,51 @@
+import json
+import zipfile
+
+from src.utilities.rpc import SongLibrary, read_song_metadata
+
+
+def write_archive(path, entries: dict[str, str], compression=zipfile.ZIP_STORED) -> str:
+    with zipfile.ZipFile(path, "w", compression) as archive:
+        for name, content in entries.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def beatmap(title: str, **meta) -> dict[str, str]:
+    return {"beatmap.meta.bin": json.dumps({
+        "Name": title, "Author": "Artist", "Beatmapper": "Mapper", "Track": {"Expert": [1]}, **meta,
+    })}
+
+
+def test_metadata_of_a_malformed_archive_is_none(tmp_path):
+    assert read_song_metadata(write_archive(tmp_path / "list.synth", {"beatmap.meta.bin": "[1, 2]"})) is None
+    assert read_song_metadata(write_archive(tmp_path / "meta.synth", {"synthriderz.meta.json": '"song"'})) is None
+    assert read_song_metadata(write_archive(tmp_path / "track.synth", beatmap("Song", Track=[1]))) is None
+    (tmp_path / "not-a-zip.synth").write_bytes(b"not a zip")
+    assert read_song_metadata(str(tmp_path / "not-a-zip.synth")) is None
+
+
+def test_bpm_is_a_number_or_none(tmp_path):
+    assert read_song_metadata(write_archive(tmp_path / "a.synth", beatmap("A", BPM="128")))["bpm"] == 128.0
+    assert read_song_metadata(write_archive(tmp_path / "b.synth", beatmap("B", BPM="fast")))["bpm"] is None
+
+
+def test_scan_indexes_the_other_archives_when_one_is_broken(tmp_path):
+    songs = tmp_path / "CustomSongs"
+    songs.mkdir()
+    write_archive(songs / "good.synth", beatmap("Good", BPM=120))
+    write_archive(songs / "broken.synth", {"beatmap.meta.bin": "[]"})
+    broken = songs / "unsupported.synth"
+    write_archive(broken, beatmap("Unsupported"))
+    # Mark the entry as compressed with a method zipfile can't read
+    data = bytearray(broken.read_bytes())
+    for header in (b"PK\x03\x04", b"PK\x01\x02"):
+        offset = data.find(header) + (8 if header == b"PK\x03\x04" else 10)
+        data[offset:offset + 2] = (99).to_bytes(2, "little")
+    broken.write_bytes(bytes(data))
+
+    library = SongLibrary(str(songs), str(tmp_path / "cache"), 2)
+
+    assert library.scan() == (3, 0)
+    assert library.find("Good", "Artist", "Mapper")["bpm"] == 120.0
+    assert library.find("Unsupported", "Artist", "Mapper") is None
@@ -0,0 +1,103 @@
+import inspect
+import threading
+import tracemalloc
+
+from config import Config
+from tests.helpers import note_hit, song_start
+
+CYCLES = 1000
+
+
+class FakeDiscord:
+    def __init__(self) -> None:
+        self.connects = 0
+        self.updates = 0
+        self.clears = 0
+
+    def connect(self) -> None:
+        self.connects += 1
+
+    def update(self, **payload) -> None:
+        self.updates += 1
+
+    def clear(self) -> None:
+        self.clears += 1
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.open = 0
+        self.max_open = 0
+
+    def start(self) -> None:
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+
+    def stop(self) -> None:
+        self.open -= 1
+
+
+class FakeGame:
+    """
+    Launches the game whenever the RPC waits for it and plays one short song per launch
+    """
+
+    def __init__(self, presence) -> None:
+        self.presence = presence
+        self.launches = 0
+        self.running_checks = 0
+        self.stack_depths = []
+        self.threads = []
+        self.traced = []
+
+    def wait(self) -> int:
+        self.launches += 1
+        self.stack_depths.append(len(inspect.stack(0)))
+        self.threads.append(threading.active_count())
+        if self.launches == CYCLES // 6 or self.launches == CYCLES:
+            self.traced.append(tracemalloc.take_snapshot())
+        if self.launches == CYCLES:
+            # The RPC stops once the game exits for the last time
+            self.presence.config["keep_running_preference"] = False
+
+        self.running_checks = 2
+        self.presence.handle_websocket_message(song_start(f"Song {self.launches}"))
+        for note in range(1, 21):
+            self.presence.handle_websocket_message(note_hit(note * 100, note))
+        return 1000 + self.launches
+
+    def is_running(self) -> bool:
+        self.running_checks -= 1
+        return self.running_checks > 0
+
+    def track(self, pid: int) -> None:
+        pass
+
+
+def test_keep_running_soak_keeps_a_flat_stack_and_constant_memory(make_presence, monkeypatch):
+    monkeypatch.setattr(Config, "PROCESS_CHECK_INTERVAL", 0)
+    presence = make_presence(keep_running_preference=True)
+    discord = presence.presence = FakeDiscord()
+    websocket = presence.websocket = FakeWebSocket()
+    game = FakeGame(presence)
+    presence.game_launch = game
+    presence.game_process = game
+
+    tracemalloc.start()
+    try:
+        presence.start()
+    finally:
+        tracemalloc.stop()
+
+    assert game.launches == CYCLES
+    # One Discord connection for every game session, and the WebSocket is only open in game
+    assert discord.connects == 1
+    assert discord.clears == CYCLES
+    assert websocket.max_open == 1 and websocket.open == 0
+    # No recursion and no leaked threads between game sessions
+    assert len(set(game.stack_depths)) == 1
+    assert len(set(game.threads[1:])) == 1
+
+    first, last = game.traced
+    growth = sum(stat.size_diff for stat in last.compare_to(first, "filename"))
+    assert growth < 256 * 1024, f"{growth} bytes more after {CYCLES - CYCLES // 6} game sessions"
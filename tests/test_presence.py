@@ -0,0 +1,62 @@
+from src.utilities.rpc import SongState
+from src.utilities.rpc.aio import AsyncPresence
+
+from tests.helpers import note_hit, song_start
+
+
+def read_log(presence):
+    presence.logger.close()
+    with open(presence.logger.log_file_path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_invalid_template_falls_back_to_the_default(make_presence):
+    presence = make_presence(presence_state_template="{life[0]}")
+
+    presence.handle_websocket_message(song_start())
+    presence.process_buffered_events()
+
+    assert presence.render_presence()["state"].startswith("Master | 00:00/02:00")
+    assert "Invalid presence_state_template" in read_log(presence)
+
+
+def test_template_failing_on_real_values_falls_back_to_the_default(make_presence):
+    presence = make_presence(presence_small_text_template="{bpm:d} BPM")
+    assert presence.small_text_template == "{bpm:d} BPM"
+
+    # Only songs found in the library have a BPM
+    presence.state = presence.state.with_song(
+        SongState(1, "Song", "Artist", "Master", "Mapper", 120, bpm=128.5)
+    )
+
+    assert presence.render_presence()["small_text"] == "Mapped by Mapper"
+    assert presence.small_text_template == "Mapped by {mapper}"
+    assert "Could not render '{bpm:d} BPM'" in read_log(presence)
+
+
+def test_coalesced_note_hits_keep_the_peak_combo_and_the_hit_rate(make_presence):
+    presence = make_presence()
+    presence.handle_websocket_message(song_start())
+    presence.process_buffered_events()
+
+    for score, combo in ((480, 48), (490, 49), (500, 50), (510, 1), (520, 2)):
+        presence.handle_websocket_message(note_hit(score, combo, 0.5))
+    # The hits waited in one slot, so they are handled as a single event
+    assert len(presence.events.pending) == 1
+    presence.process_buffered_events()
+
+    play = presence.state.play
+    assert (play.score, play.combo, play.life) == (520, 2, 0.5)
+    assert play.max_combo == 50
+    assert presence.rolling_stats.size == 5
+
+
+def test_async_presence_counts_its_own_reconnects(presence_config):
+    presence = AsyncPresence(presence_config)
+    try:
+        # The threaded clients are never started on the event loop
+        assert presence.websocket is None and presence.presence is None and presence.session is None
+        presence.reconnect_count = 3
+        assert "websocket_reconnects 3" in presence.metrics.render()
+    finally:
+        presence.logger.close()
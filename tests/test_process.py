@@ -0,0 +1,160 @@
+import shutil
+import subprocess
+import sys
+
+import pytest
+from psutil import process_iter
+
+from src.utilities.rpc.process import WBEM_E_TIMED_OUT, LaunchDetector, ProcessWatcher
+
+linux_only = pytest.mark.skipif(sys.platform != "linux", reason="spawns copies of /bin/sleep")
+OTHER_PROCESSES = 2000
+
+
+@pytest.fixture
+def spawn_dummy(tmp_path):
+    """
+    Spawn processes with a name nothing else on the machine uses
+    """
+    executable = tmp_path / "srdummy-game"
+    shutil.copy(shutil.which("sleep"), executable)
+    processes = []
+
+    def spawn() -> subprocess.Popen:
+        process = subprocess.Popen([str(executable), "60"])
+        processes.append(process)
+        return process
+
+    spawn.name = executable.name
+    yield spawn
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.kill()
+    process.wait()
+
+
+@linux_only
+def test_watcher_finds_the_process_once_and_then_checks_only_its_pid(spawn_dummy, monkeypatch):
+    game = spawn_dummy()
+    watcher = ProcessWatcher(spawn_dummy.name)
+    scans = []
+    find = watcher.find
+    monkeypatch.setattr(watcher, "find", lambda: scans.append(None) or find())
+
+    assert watcher.is_running()
+    assert watcher.process.pid == game.pid
+    for _ in range(10):
+        assert watcher.is_running()
+    assert len(scans) == 1
+
+    stop(game)
+    assert not watcher.is_running()
+    assert len(scans) == 2
+
+
+@linux_only
+def test_watcher_follows_a_restarted_process(spawn_dummy):
+    watcher = ProcessWatcher(spawn_dummy.name)
+    assert not watcher.is_running()
+
+    first = spawn_dummy()
+    assert watcher.is_running()
+    stop(first)
+    second = spawn_dummy()
+
+    assert watcher.is_running()
+    assert watcher.process.pid == second.pid
+
+
+@linux_only
+def test_watcher_tracks_a_pid_found_by_the_launch_detector(spawn_dummy):
+    game = spawn_dummy()
+    detector = LaunchDetector(spawn_dummy.name, poll_interval=0.01, full_scan_interval=300)
+    watcher = ProcessWatcher(spawn_dummy.name)
+
+    watcher.track(detector.wait())
+
+    assert watcher.process.pid == game.pid
+
+
+@linux_only
+def test_cached_check_does_not_scan_thousands_of_processes(spawn_dummy, monkeypatch):
+    # Counting the processes visited instead of timing the checks keeps the test stable on busy machines
+    visited = []
+
+    def counting_process_iter(*args, **kwargs):
+        for process in process_iter(*args, **kwargs):
+            visited.append(process.pid)
+            yield process
+
+    monkeypatch.setattr("src.utilities.rpc.process.process_iter", counting_process_iter)
+    others = [subprocess.Popen(["sleep", "60"]) for _ in range(OTHER_PROCESSES)]
+    try:
+        spawn_dummy()
+        # Checking for a process that isn't running scans through all the others every time
+        assert not ProcessWatcher("srdummy-missing").is_running()
+        assert len(visited) > OTHER_PROCESSES
+
+        visited.clear()
+        watcher = ProcessWatcher(spawn_dummy.name)
+        assert watcher.is_running()
+        assert visited
+
+        visited.clear()
+        for _ in range(1000):
+            assert watcher.is_running()
+        assert visited == []
+    finally:
+        for process in others:
+            stop(process)
+
+
+class FailingEvents:
+    """
+    A WMI event watcher that fails right away, e.g. when used from another COM apartment
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def NextEvent(self, timeout):
+        self.calls += 1
+        raise RuntimeError("The application called an interface that was marshalled for a different thread")
+
+
+class TimedOut(Exception):
+    hresult = -2147352567
+    excepinfo = (0, "SWbemEventSource", "Timed out", None, 0, WBEM_E_TIMED_OUT)
+
+
+def test_broken_event_watcher_falls_back_to_polling(monkeypatch):
+    detector = LaunchDetector("NotARealProcess.exe", poll_interval=0.01, full_scan_interval=300)
+    events = FailingEvents()
+    polls = []
+    sleeps = []
+
+    def poll():
+        polls.append(None)
+        return 1234 if len(polls) == 4 else None
+
+    monkeypatch.setattr(detector, "watch_events", lambda: events)
+    monkeypatch.setattr(detector, "poll", poll)
+    monkeypatch.setattr("src.utilities.rpc.process.sleep", sleeps.append)
+
+    assert detector.wait() == 1234
+    assert events.calls == 1
+    assert sleeps == [0.01, 0.01, 0.01]
+
+
+def test_event_timeout_is_not_an_error():
+    detector = LaunchDetector("NotARealProcess.exe", poll_interval=0.01, full_scan_interval=300)
+
+    class Events:
+        def NextEvent(self, timeout):
+            raise TimedOut()
+
+    assert detector.wait_for_event(Events()) is None
@@ -0,0 +1,72 @@
+import gc
+import os
+import time
+import tracemalloc
+from base64 import b64encode
+
+import pytest
+
+from src.utilities.rpc.standins import FakeUploadServer
+
+from tests.helpers import note_hit, song_end, song_start
+
+ALBUM_ART = "data:image/png;base64," + b64encode(os.urandom(300_000)).decode("ascii")
+
+
+@pytest.fixture
+def uploads():
+    server = FakeUploadServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def play_song(presence, number: int) -> int:
+    """
+    Play a song with album art through the event buffer, as the WebSocket thread would
+
+    :return: The traced memory while the song was played, after its album art was uploaded
+    """
+    presence.handle_websocket_message(song_start(f"Song {number}", albumArt=ALBUM_ART))
+    presence.process_buffered_events()
+    deadline = time.monotonic() + 5
+    while presence.state.song.album_url is None:
+        assert time.monotonic() < deadline, "the album art was never uploaded"
+        time.sleep(0.001)
+
+    for note in range(1, 51):
+        presence.handle_websocket_message(note_hit(note * 100, note))
+        presence.process_buffered_events()
+    gc.collect()
+    during, _ = tracemalloc.get_traced_memory()
+
+    presence.handle_websocket_message(song_end())
+    presence.process_buffered_events()
+    return during
+
+
+def test_song_state_keeps_constant_memory_per_song_and_drops_the_album_art(make_presence, uploads):
+    presence = make_presence(image_upload_url=uploads.upload_url, image_max_size=0)
+    presence.uploader.start()
+
+    tracemalloc.start()
+    try:
+        # Warm up the caches, histograms and connection pool first
+        for number in range(10):
+            play_song(presence, number)
+        gc.collect()
+        before, _ = tracemalloc.get_traced_memory()
+
+        songs = 50
+        during = max(play_song(presence, number) for number in range(10, 10 + songs))
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # The same album art is replayed, so only the first song uploads it
+    assert len(uploads.uploads) == 1
+    # The 400 KB data URL is released once it is handed to the uploader
+    assert during - before < len(ALBUM_ART) // 4
+    per_song = (after - before) / songs
+    assert per_song < 1024, f"{per_song:.0f} bytes per song"
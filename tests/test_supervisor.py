@@ -0,0 +1,165 @@
+import threading
+import time
+
+from websocket import WebSocketApp
+from websockets.sync.server import serve
+
+from src.utilities.rpc import ReconnectBackoff, WebSocketSupervisor
+
+
+class DroppingWebSocketServer:
+    """
+    A WebSocket stand-in that sends one message and then drops every connection
+    """
+
+    def __init__(self, hold: float = 0) -> None:
+        """
+        :param hold: Seconds to keep each connection open before dropping it
+        """
+        self.hold = hold
+        self.connections = 0
+        self.open_connections = 0
+        self.max_open_connections = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.server = serve(self.handle, "127.0.0.1", 0, close_timeout=0.1)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handle(self, ws) -> None:
+        with self.lock:
+            self.connections += 1
+            self.open_connections += 1
+            self.max_open_connections = max(self.max_open_connections, self.open_connections)
+        try:
+            ws.send(f"message {self.connections}")
+            self.stopping.wait(self.hold)
+        finally:
+            with self.lock:
+                self.open_connections -= 1
+        # Returning closes the connection
+
+    def stop(self) -> None:
+        self.stopping.set()
+        self.server.shutdown()
+
+
+class RecordingBackoff(ReconnectBackoff):
+    def __init__(self, initial_delay: float, max_delay: float) -> None:
+        super().__init__(initial_delay, max_delay)
+        self.delays = []
+
+    def next_delay(self) -> float:
+        delay = super().next_delay()
+        self.delays.append(delay)
+        return delay
+
+
+def make_supervisor(url: str, received: list, closed: list, backoff: ReconnectBackoff, stable_after=60):
+    return WebSocketSupervisor(
+        url,
+        received.append,
+        lambda: None,
+        lambda: closed.append(None),
+        lambda: True,
+        backoff,
+        stable_after,
+    )
+
+
+def client_threads() -> list[threading.Thread]:
+    # The server keeps threads around per connection while it closes
+    server_threads = ("(serve_forever)", "(sock_handler)", "(recv_events)", "(keepalive)")
+    return [thread for thread in threading.enumerate() if not thread.name.endswith(server_threads)]
+
+
+def wait_until(condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_backoff_doubles_up_to_the_maximum_and_resets():
+    backoff = ReconnectBackoff(1, 8)
+
+    delays = [backoff.next_delay() for _ in range(6)]
+    for delay, ceiling in zip(delays, (1, 2, 4, 8, 8, 8)):
+        assert ceiling / 2 <= delay <= ceiling
+
+    backoff.reset()
+    assert 0.5 <= backoff.next_delay() <= 1
+
+
+def test_supervisor_reconnects_dropped_connections_with_one_connection_at_a_time():
+    server = DroppingWebSocketServer()
+    received, closed = [], []
+    supervisor = make_supervisor(server.url, received, closed, ReconnectBackoff(0.01, 0.02))
+    threads_before = len(client_threads())
+
+    supervisor.start()
+    wait_until(lambda: len(closed) >= 20)
+    # Reconnecting doesn't pile up threads
+    assert len(client_threads()) <= threads_before + 1
+    supervisor.stop()
+    server.stop()
+
+    assert not supervisor.thread.is_alive()
+    assert server.max_open_connections == 1
+    assert supervisor.reconnect_count >= 19
+    assert len(received) >= 20
+    assert received[:2] == ["message 1", "message 2"]
+
+
+def test_supervisor_resets_the_backoff_after_a_stable_connection():
+    server = DroppingWebSocketServer(hold=0.2)
+    received, closed = [], []
+    backoff = RecordingBackoff(0.01, 30)
+    supervisor = make_supervisor(server.url, received, closed, backoff, stable_after=0.1)
+
+    supervisor.start()
+    wait_until(lambda: len(closed) >= 4)
+    supervisor.stop()
+    server.stop()
+
+    # Without the reset, the delay would double with every reconnect
+    assert all(delay <= 0.01 for delay in backoff.delays[:3])
+
+
+def test_supervisor_keeps_retrying_while_nothing_listens():
+    server = DroppingWebSocketServer()
+    url = server.url
+    server.stop()
+    received, closed = [], []
+    supervisor = make_supervisor(url, received, closed, ReconnectBackoff(0.01, 0.02))
+
+    supervisor.start()
+    wait_until(lambda: supervisor.reconnect_count >= 5)
+    supervisor.stop()
+
+    # Failed attempts are not reported as closed connections
+    assert closed == []
+    assert received == []
+
+
+def test_stop_just_before_connecting_is_not_lost(monkeypatch):
+    server = DroppingWebSocketServer(hold=30)
+    received, closed, opened = [], [], []
+    supervisor = make_supervisor(server.url, received, closed, ReconnectBackoff(0.01, 0.02))
+    supervisor.on_open = lambda: opened.append(None)
+
+    class StoppedBeforeRunning(WebSocketApp):
+        def run_forever(self, **options):
+            # stop() lands between the supervisor's check and run_forever()
+            supervisor.stopped.set()
+            self.keep_running = False
+            return super().run_forever(**options)
+
+    monkeypatch.setattr("src.utilities.rpc.supervisor.WebSocketApp", StoppedBeforeRunning)
+    supervisor.start()
+    supervisor.thread.join(5)
+    alive = supervisor.thread.is_alive()
+    server.stop()
+
+    assert not alive
+    assert opened == []